@@ -7,14 +7,18 @@ It produces CoincEvents/<PAIR>.csv with columns: second,t1_ps,t2_ps
 for pairs: HH, VV, DD, AA, HV, VH, DA, AD (only those present in data).
 
 This script reads the available CoincEvents/*.csv, computes a few
-time-difference distributions, and saves per-pair PNGs.
+time-difference distributions, and saves per-pair PNGs. Parsed events are
+cached as a sorted <PAIR>.npz beside each CSV for faster re-runs.
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse
+import os
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+# matplotlib.pyplot is imported inside the plotting helpers so --no-plot runs
+# never pay its import cost.
 
 EVENT_DIR = Path("CoincEvents")
 PAIRS = ["HH", "VV", "DD", "AA", "HV", "VH", "DA", "AD"]
@@ -29,33 +33,99 @@ PAIR_CHANNELS = {
     "DA": (3, 8),
     "AD": (4, 7),
 }
+# Event dumps only ever hold integer picosecond columns; declaring them up front
+# lets the C parser skip type inference.
+EVENT_DTYPES = {"second": np.int64, "t1_ps": np.int64, "t2_ps": np.int64}
+# Working precision for timing deltas, histograms and FFTs. Histogram bins and
+# the reconstruction noise floor are far coarser than float32 resolution.
+DTYPE = np.float32
+# Bin count for the timing histograms; identical for every pair and panel.
+HIST_BINS = 200
+# Rows parsed per read_csv chunk; bounds the parser's temporary DataFrame size.
+EVENT_CHUNK_ROWS = 2_000_000
 
 
 def load_events(path: Path):
     if not path.exists():
         return None
-    df = pd.read_csv(path)
-    expected = {"second", "t1_ps", "t2_ps"}
-    if not expected.issubset(df.columns):
-        raise ValueError(f"{path} missing expected columns {expected}")
-    if len(df) < 2:
+    # Sorted binary sidecar written on a previous run; used only while it is
+    # at least as new as the CSV it was built from.
+    cache = path.with_suffix(".npz")
+    if cache.exists() and cache.stat().st_mtime >= path.stat().st_mtime:
+        with np.load(cache) as data:
+            second, t1, t2 = (data[col] for col in EVENT_DTYPES)
+        return (second, t1, t2) if len(second) >= 2 else None
+
+    # Parse in chunks, keeping only the int64 column arrays, so peak memory is
+    # the final arrays plus one chunk rather than a whole DataFrame.
+    expected = set(EVENT_DTYPES)
+    columns = {col: [] for col in EVENT_DTYPES}
+    with pd.read_csv(path, engine="c", usecols=lambda col: col in EVENT_DTYPES,
+                     dtype=EVENT_DTYPES, memory_map=True,
+                     chunksize=EVENT_CHUNK_ROWS) as reader:
+        for chunk in reader:
+            if not expected.issubset(chunk.columns):
+                raise ValueError(f"{path} missing expected columns {expected}")
+            for col, parts in columns.items():
+                parts.append(chunk[col].to_numpy())
+    second, t1, t2 = (np.concatenate(parts) for parts in columns.values())
+    order = temporal_order(second, t1, t2)
+    if order is not None:
+        second, t1, t2 = second[order], t1[order], t2[order]
+    try:
+        np.savez(cache, second=second, t1_ps=t1, t2_ps=t2)
+    except OSError:
+        pass  # read-only data dir: just parse the CSV again next time
+    if len(second) < 2:
         return None
-    # Sort by (second, t1_ps) to ensure temporal order
-    return df.sort_values(["second", "t1_ps", "t2_ps"], ignore_index=True)
+    return second, t1, t2
 
 
-def compute_diffs(df: pd.DataFrame):
-    """Compute several timing deltas (all in picoseconds)."""
-    t1 = df["t1_ps"].to_numpy()
-    t2 = df["t2_ps"].to_numpy()
+def temporal_order(second: np.ndarray, t1: np.ndarray, t2: np.ndarray):
+    """
+    Permutation sorting events by (second, t1_ps, t2_ps), or None if they are
+    already in that order. CoincPairs writes seconds in order, so the common
+    case is a linear check; when only the within-second order is off, each
+    second's block is sorted on its own instead of a full 3-key lexsort.
+    """
+    if len(second) < 2:
+        return None
+    if np.any(second[1:] < second[:-1]):
+        return np.lexsort((t2, t1, second))
+    same = second[1:] == second[:-1]
+    dt1 = t1[1:] - t1[:-1]
+    unordered = same & ((dt1 < 0) | ((dt1 == 0) & (t2[1:] < t2[:-1])))
+    if not unordered.any():
+        return None
+    order = np.arange(len(second))
+    bounds = np.concatenate(([0], np.flatnonzero(~same) + 1, [len(second)]))
+    # Only blocks containing an out-of-order step need sorting.
+    for blk in np.unique(np.searchsorted(bounds, np.flatnonzero(unordered) + 1) - 1):
+        lo, hi = bounds[blk], bounds[blk + 1]
+        order[lo:hi] = lo + np.lexsort((t2[lo:hi], t1[lo:hi]))
+    return order
 
-    diffs = {}
-    # Gap between consecutive coincidences: next t1 minus previous t2
-    diffs["distances"] = t1[1:] - t2[:-1]
+
+def compute_diffs(t1: np.ndarray, t2: np.ndarray):
+    """Compute several timing deltas (all in picoseconds).
+
+    Each output is written once into its own DTYPE buffer; the consecutive
+    delta reuses the per-coincidence difference instead of re-deriving it from
+    t1/t2. Differences are taken in int64 and only the result is narrowed.
+    """
+    n = len(t1)
+    diffs = {
+        "distances": np.empty(n - 1, dtype=DTYPE),
+        "coinc_times": np.empty(n, dtype=DTYPE),
+        "consecutive_delta": np.empty(n - 1, dtype=DTYPE),
+    }
     # Per-coincidence internal difference
-    diffs["coinc_times"] = t2 - t1
+    np.subtract(t2, t1, out=diffs["coinc_times"], casting="unsafe")
+    # Gap between consecutive coincidences: next t1 minus previous t2
+    np.subtract(t1[1:], t2[:-1], out=diffs["distances"], casting="unsafe")
     # Change in internal difference between consecutive coincidences
-    diffs["consecutive_delta"] = (t2[1:] - t1[1:]) - (t2[:-1] - t1[:-1])
+    coinc = diffs["coinc_times"]
+    np.subtract(coinc[1:], coinc[:-1], out=diffs["consecutive_delta"])
     return diffs
 
 
@@ -64,24 +134,36 @@ def plot_hist(ax, data, title, color):
         ax.set_title(f"{title}\n(no data)")
         ax.axis("off")
         return
-    n_bins = min(200, max(20, len(data) // 25))
-    ax.hist(data, bins=n_bins, color=color, edgecolor="black", alpha=0.65)
+    # Bin once with numpy and draw the pre-binned counts; ax.hist would redo
+    # the binning and build one Rectangle patch per bar.
+    counts, edges = np.histogram(data, bins=HIST_BINS)
+    ax.stairs(counts, edges, fill=True, color=color, edgecolor="black", alpha=0.65)
     ax.set_title(title, fontsize=11)
     ax.set_xlabel("Time diff (ps)")
     ax.set_ylabel("Count")
     ax.grid(alpha=0.25)
 
 
+def autocorrelation(data, max_lag):
+    """
+    Mean-removed autocorrelation for lags 0..max_lag, normalized to lag 0.
+    Uses a zero-padded FFT (O(N log N)) instead of np.correlate's O(N^2) full
+    correlation; padding to >= 2N-1 keeps the circular result equal to the
+    linear one.
+    """
+    x = data - np.mean(data)
+    n_fft = 1 << (2 * len(x) - 1).bit_length()
+    spec = np.fft.rfft(x, n_fft)
+    corr = np.fft.irfft(spec * np.conj(spec), n_fft)[: min(max_lag, len(x) - 1) + 1]
+    return corr / corr[0] if corr[0] != 0 else corr
+
+
 def plot_autocorr(ax, data, title, max_lag):
     if data is None or len(data) < 2:
         ax.set_title(f"{title}\n(no data)")
         ax.axis("off")
         return
-    x = data - np.mean(data)
-    corr_full = np.correlate(x, x, mode="full")
-    mid = len(corr_full) // 2
-    corr = corr_full[mid : mid + max_lag + 1]
-    corr = corr / corr[0] if corr[0] != 0 else corr
+    corr = autocorrelation(data, max_lag)
     lags = np.arange(len(corr))
     ax.plot(lags, corr, color="darkorange")
     ax.set_title(title)
@@ -93,7 +175,8 @@ def plot_autocorr(ax, data, title, max_lag):
 def phase_retrieve_from_hist(values, bins, iters, seeds, support_frac=0.4, nonneg=False):
     """
     values: array of t2-t1 samples (ps)
-    bins: integer number of bins for histogram (regular grid for FFT)
+    bins: integer number of bins for histogram (regular grid for FFT); padded
+      up to the next power of two
     Returns time grid (bin centers) and reconstructed waveform samples.
     """
     if len(values) < 4:
@@ -106,47 +189,89 @@ def phase_retrieve_from_hist(values, bins, iters, seeds, support_frac=0.4, nonne
     hist, edges = np.histogram(values, bins=bins, range=(lo, hi))
     centers = 0.5 * (edges[:-1] + edges[1:])
 
-    g = hist.astype(float)
-    n = len(g)
+    # Zero-pad symmetrically to a power-of-two length so every FFT below takes
+    # the radix-2 path whatever --recon-bins is; the time grid is extended
+    # with the same bin width and the support keeps its width in ps.
+    n = 1 << (bins - 1).bit_length()
+    pad = (n - bins) // 2
+    if n != bins:
+        hist = np.pad(hist, (pad, n - bins - pad))
+        centers = centers[0] + (edges[1] - edges[0]) * (np.arange(n) - pad)
+
+    g = hist.astype(DTYPE)
     G = np.fft.rfft(g)
     mag = np.sqrt(np.maximum(G.real, 0.0))
 
-    support_len = max(8, int(n * support_frac))
+    support_len = max(8, int(bins * support_frac))
     start = (n - support_len) // 2
     mask = np.zeros(n, dtype=bool)
     mask[start : start + support_len] = True
 
+    if seeds < 1:
+        return centers, None
+
     rng = np.random.default_rng()
-    best_err = np.inf
-    best_f = None
-
-    for _ in range(seeds):
-        phase = np.exp(1j * rng.uniform(0, 2 * np.pi, mag.shape))
-        F = mag * phase
-        for _ in range(iters):
-            f = np.fft.irfft(F, n)
-            if nonneg:
-                f = np.maximum(f, 0)
-            f = f * mask
-            F_est = np.fft.rfft(f)
-            phase = np.exp(1j * np.angle(F_est))
-            F = mag * phase
-        f_final = np.fft.irfft(F, n).real
-        residual = np.linalg.norm(np.abs(np.fft.rfft(f_final)) - mag)
-        if residual < best_err:
-            best_err = residual
-            best_f = f_final
-    return centers, best_f
-
-
-
-def summarize_pair(pair, df, window_ps):
-    t2t1 = df["t2_ps"].to_numpy() - df["t1_ps"].to_numpy()
-    median = float(np.median(t2t1))
+    # All seeds advance together as rows of one (seeds, n) batch, so each
+    # iteration is a single batched irfft/rfft pair rather than `seeds`
+    # separate Python-level loops. The spectrum and |F_est| buffers are reused
+    # across iterations; only the FFT outputs are freshly allocated.
+    F = np.empty((seeds, mag.size), dtype=np.result_type(DTYPE, np.complex64))
+    amp = np.empty(F.shape, dtype=DTYPE)
+    # Random starting phases: a 2D standard normal has a uniform angle, so
+    # normalizing it gives unit phasors without evaluating exp(1j * phase).
+    F.real, F.imag = rng.standard_normal((2,) + F.shape, dtype=DTYPE)
+    np.abs(F, out=amp)
+    F /= amp
+    F *= mag
+
+    for _ in range(iters):
+        f = np.fft.irfft(F, n, axis=-1)
+        if nonneg:
+            np.maximum(f, 0, out=f)
+        f *= mask
+        F_est = np.fft.rfft(f, axis=-1)
+        # Unit phasor F_est/|F_est| (phase 0 where |F_est| == 0) instead of
+        # exp(1j * angle(F_est)): one abs + divide rather than atan2 + sincos.
+        np.abs(F_est, out=amp)
+        F.fill(1.0)
+        np.divide(F_est, amp, out=F, where=amp > 0)
+        F *= mag
+    f_final = np.fft.irfft(F, n, axis=-1)
+    if iters < 1:
+        return centers, f_final[0]
+    # amp still holds |F_est| of the last support-constrained iterate, so the
+    # Fourier-magnitude misfit needs no extra rfft; squared sums rank seeds
+    # the same as the norm.
+    amp -= mag
+    residual = np.einsum("ij,ij->i", amp, amp)
+    return centers, f_final[int(np.argmin(residual))]
+
+
+
+def partitioned_quantiles(a: np.ndarray, qs):
+    """
+    Linear-interpolated quantiles (same as np.percentile's default method) via
+    one np.partition over all needed order statistics, O(N) instead of a sort.
+    Partitions `a` in place; pass a scratch array.
+    """
+    pos = np.asarray(qs, dtype=float) * (len(a) - 1)
+    lo = np.floor(pos).astype(np.intp)
+    hi = np.minimum(lo + 1, len(a) - 1)
+    a.partition(np.unique(np.concatenate([lo, hi])))
+    frac = pos - lo
+    return a[lo] + (a[hi] - a[lo]) * frac
+
+
+def summarize_pair(pair, t1, t2, window_ps):
+    t2t1 = t2 - t1
+    # Every statistic below is order-independent, so t2t1 (a fresh array) can
+    # be partitioned in place; the deviations get their own scratch buffer.
+    p16, median, p84 = (float(v) for v in partitioned_quantiles(t2t1, [0.16, 0.5, 0.84]))
+    dev = np.abs(t2t1 - median)
+    mad = float(partitioned_quantiles(dev, [0.5])[0])
     mean = float(np.mean(t2t1))
-    std = float(np.std(t2t1))
-    mad = float(np.median(np.abs(t2t1 - median)))
-    p16, p84 = np.percentile(t2t1, [16, 84])
+    centered = t2t1 - mean
+    std = float(np.sqrt(np.dot(centered, centered) / len(t2t1)))
     fwhm_like = p84 - p16
     summary = {
         "pair": pair,
@@ -161,21 +286,75 @@ def summarize_pair(pair, df, window_ps):
     if window_ps is not None:
         # CoincPairs uses ±coinc_window_ps internally; treat window_ps as that half-width
         half = window_ps
-        frac_in_window = np.mean((t2t1 >= median - half) & (t2t1 <= median + half))
+        # Reuse |t2t1 - median| from the MAD: one compare and count, no bool pair.
+        frac_in_window = np.count_nonzero(dev <= half) / len(dev)
         summary["frac_in_window"] = float(frac_in_window)
     return summary
 
 
+# Figures kept alive across pairs when nothing is shown interactively, keyed by
+# panel name. Clearing the axes is much cheaper than building a new figure.
+_FIGURE_CACHE = {}
+
+
+def get_figure(key: str, nrows: int, ncols: int, figsize, reuse: bool):
+    import matplotlib.pyplot as plt
+
+    if not reuse:
+        return plt.subplots(nrows, ncols, figsize=figsize)
+    if key not in _FIGURE_CACHE:
+        _FIGURE_CACHE[key] = plt.subplots(nrows, ncols, figsize=figsize)
+    fig, axes = _FIGURE_CACHE[key]
+    for ax in np.atleast_1d(axes):
+        ax.clear()
+    return fig, axes
+
+
+def finish_figure(fig, out_png: Path, show: bool, note: str = ""):
+    import matplotlib.pyplot as plt
+
+    fig.tight_layout()
+    fig.savefig(out_png, dpi=150)
+    print(f"  wrote {out_png}{note}")
+    if show:
+        # A shown window may be closed by the user, so it is never reused.
+        plt.show()
+        plt.close(fig)
+
+
+def plot_reconstruction(pair: str, coinc_times: np.ndarray, recon: dict, base_dir: Path,
+                        show: bool = True):
+    centers, f_rec = phase_retrieve_from_hist(coinc_times, nonneg=False, **recon)
+    if centers is None or f_rec is None:
+        return
+    fig, ax = get_figure("waveform", 1, 1, (10, 4), reuse=not show)
+    ax.plot(centers, f_rec, color="purple")
+    ax.set_title(f"{pair}: reconstructed waveform (arb. units)")
+    ax.set_xlabel("Time (ps)")
+    ax.set_ylabel("Amplitude (arb.)")
+    ax.grid(alpha=0.25)
+    finish_figure(fig, base_dir / f"{pair}_waveform.png", show, " (phase-retrieved waveform)")
+
+
 def process_pair(pair: str, window_ps: float | None, max_lag: int,
-                 channel_widths, base_dir: Path):
+                 base_dir: Path, recon: dict | None = None, show: bool = True,
+                 plot: bool = True):
+    """
+    Load, summarize and plot one pair. Self-contained (no shared state) so it
+    can run in a worker process; returns the summary dict or None.
+    recon: keyword arguments for phase_retrieve_from_hist, or None to skip it.
+    show: display each figure interactively; otherwise figures are only saved
+    and reused for the next pair.
+    plot: False prints the summary only (no diffs, figures or reconstruction).
+    """
     path = base_dir / f"{pair}.csv"
-    df = load_events(path)
-    if df is None:
+    events = load_events(path)
+    if events is None:
         print(f"{pair}: no events")
-        return None, None
+        return None
 
-    diffs = compute_diffs(df)
-    summary = summarize_pair(pair, df, window_ps)
+    _, t1, t2 = events
+    summary = summarize_pair(pair, t1, t2, window_ps)
     print(
         f"{pair}: median(t2-t1)={summary['median_ps']:.2f} ps, "
         f"FWHM-like={summary['fwhm_like_ps']:.2f} ps, "
@@ -183,37 +362,34 @@ def process_pair(pair: str, window_ps: float | None, max_lag: int,
         + (f", frac within window={summary['frac_in_window']*100:.1f}%"
            if window_ps is not None else "")
     )
+    if not plot:
+        return summary
 
-    # Track channel jitter width for health hints
-    if pair in PAIR_CHANNELS:
-        ch1, ch2 = PAIR_CHANNELS[pair]
-        for ch in (ch1, ch2):
-            channel_widths.setdefault(ch, []).append(summary["fwhm_like_ps"])
-
+    diffs = compute_diffs(t1, t2)
     # Main histogram panel
-    fig, axes = plt.subplots(1, 3, figsize=(15, 4.5))
+    fig, axes = get_figure("hist", 1, 3, (15, 4.5), reuse=not show)
     fig.suptitle(f"{pair} coincidence timing distributions", fontsize=13, weight="bold")
     plot_hist(axes[0], diffs["distances"], f"{pair}: gap (next t1 - prev t2)", "gray")
     plot_hist(axes[1], diffs["coinc_times"], f"{pair}: t2 - t1", "steelblue")
     plot_hist(axes[2], diffs["consecutive_delta"], f"{pair}: Δ(t2-t1) between events", "crimson")
-    plt.tight_layout()
-    out_png = base_dir / f"{pair}_hist.png"
-    plt.savefig(out_png, dpi=150)
-    print(f"  wrote {out_png}")
-    plt.show()
-    plt.close(fig)
+    finish_figure(fig, base_dir / f"{pair}_hist.png", show)
 
     # Autocorr panel (gap structure)
-    fig2, ax2 = plt.subplots(1, 1, figsize=(6, 4))
+    fig2, ax2 = get_figure("autocorr", 1, 1, (6, 4), reuse=not show)
     plot_autocorr(ax2, diffs["distances"], f"{pair}: gap autocorr", max_lag)
-    plt.tight_layout()
-    out_png2 = base_dir / f"{pair}_autocorr.png"
-    plt.savefig(out_png2, dpi=150)
-    print(f"  wrote {out_png2}")
-    plt.show()
-    plt.close(fig2)
+    finish_figure(fig2, base_dir / f"{pair}_autocorr.png", show)
+
+    if recon is not None and len(diffs["coinc_times"]) > 4:
+        plot_reconstruction(pair, diffs["coinc_times"], recon, base_dir, show)
+
+    return summary
 
-    return summary, diffs
+
+def _init_worker():
+    import matplotlib.pyplot as plt
+
+    # Worker processes only write PNGs; keep them off the GUI backend.
+    plt.switch_backend("Agg")
 
 
 def summarize_channels(channel_widths):
@@ -240,6 +416,12 @@ def main():
     parser.add_argument("--recon-iters", type=int, default=600, help="Iterations per phase retrieval run")
     parser.add_argument("--recon-seeds", type=int, default=5, help="Number of random phase seeds; best residual is kept")
     parser.add_argument("--recon-support-frac", type=float, default=0.4, help="Support width as fraction of histogram length (centered)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Worker processes for pairs (0=auto). With >1, figures are saved but not shown.")
+    parser.add_argument("--no-show", action="store_true",
+                        help="Only save PNGs; skip interactive windows (batch runs)")
+    parser.add_argument("--no-plot", action="store_true",
+                        help="Print summaries and channel health only; no figures or reconstruction")
     args = parser.parse_args()
 
     EVENT_DIR = args.event_dir
@@ -276,34 +458,33 @@ def main():
         print(f"No <pair>.csv files found in {run_dir}. Run CoincPairs with --dump-events first.")
         return
 
-    summaries = []
+    recon = None
+    if args.reconstruct and not args.no_plot:
+        recon = {
+            "bins": args.recon_bins,
+            "iters": args.recon_iters,
+            "seeds": args.recon_seeds,
+            "support_frac": args.recon_support_frac,
+        }
+    jobs = args.jobs if args.jobs > 0 else min(len(available), os.cpu_count() or 1)
+    show = not args.no_show and jobs <= 1
+    pair_args = [(pair, args.window_ps, args.max_lag, run_dir, recon, show, not args.no_plot)
+                 for pair in available]
+    if jobs > 1:
+        # Pairs are independent; each worker loads, summarizes and plots one.
+        init = None if args.no_plot else _init_worker
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init) as pool:
+            results = list(pool.map(process_pair, *zip(*pair_args)))
+    else:
+        results = [process_pair(*a) for a in pair_args]
+
+    summaries = [s for s in results if s]
+    # Track channel jitter width for health hints
     channel_widths = {}
-    for pair in available:
-        summary, diffs = process_pair(pair, args.window_ps, args.max_lag, channel_widths, run_dir)
-        if summary:
-            summaries.append(summary)
-        if args.reconstruct and diffs and len(diffs["coinc_times"]) > 4:
-            centers, f_rec = phase_retrieve_from_hist(
-                diffs["coinc_times"],
-                bins=args.recon_bins,
-                iters=args.recon_iters,
-                seeds=args.recon_seeds,
-                support_frac=args.recon_support_frac,
-                nonneg=False,
-            )
-            if centers is not None and f_rec is not None:
-                fig, ax = plt.subplots(figsize=(10, 4))
-                ax.plot(centers, f_rec, color="purple")
-                ax.set_title(f"{pair}: reconstructed waveform (arb. units)")
-                ax.set_xlabel("Time (ps)")
-                ax.set_ylabel("Amplitude (arb.)")
-                ax.grid(alpha=0.25)
-                out_png = run_dir / f"{pair}_waveform.png"
-                plt.tight_layout()
-                plt.savefig(out_png, dpi=150)
-                print(f"  wrote {out_png} (phase-retrieved waveform)")
-                plt.show()
-                plt.close(fig)
+    for summary in summaries:
+        if summary["pair"] in PAIR_CHANNELS:
+            for ch in PAIR_CHANNELS[summary["pair"]]:
+                channel_widths.setdefault(ch, []).append(summary["fwhm_like_ps"])
 
     summarize_channels(channel_widths)
 
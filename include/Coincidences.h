@@ -2,6 +2,7 @@
 #include <fstream>
 #include <span>
 #include <string>
+#include <tuple>
 #include <utility>
 #include <vector>
 
@@ -16,6 +17,23 @@ int countCoincidencesWithDelay(std::span<const long long> ch1,
                                long long coincWindowPs,
                                long long delayPs);
 
+/// Counts coincidences for many independent (ch1[k], ch2[k]) pairs at one
+/// delay, e.g. the same detector pair over every second. Entries are
+/// processed in parallel when OpenMP is available; counts[k] belongs to pair k.
+std::vector<int> countCoincidencesBatch(
+    const std::vector<std::span<const long long>> &ch1,
+    const std::vector<std::span<const long long>> &ch2,
+    long long coincWindowPs, long long delayPs);
+
+/// Counts coincidences for several channel pairs drawn from one set of traces,
+/// each at its own delay: pairs[k] = (index of first channel, index of second
+/// channel, delayPs) into `channels`. Pairs run in parallel when OpenMP is
+/// available; counts[k] belongs to pairs[k].
+std::vector<int> countCoincidencesForPairs(
+    const std::vector<std::span<const long long>> &channels,
+    const std::vector<std::tuple<size_t, size_t, long long>> &pairs,
+    long long coincWindowPs);
+
 /// Collects timestamp pairs that fall within the coincidence window for a
 /// given delay. Returns pairs of (t1_ps, t2_ps) in the original clock domain.
 std::vector<std::pair<long long, long long>>
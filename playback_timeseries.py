@@ -8,6 +8,7 @@ so you can watch how coincidences/visibility/QBER evolved across runs.
 Run from the repo root or next to Delay_Scan_Data:
   python playback_timeseries.py
   python playback_timeseries.py --window 90 --interval 300 --data-dir ./Delay_Scan_Data
+  python playback_timeseries.py --save playback.mp4 --codec h264_nvenc
 """
 
 from __future__ import annotations
@@ -19,6 +20,45 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Rows parsed per read_csv chunk when loading timeseries.csv.
+CHUNK_ROWS = 100_000
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Max of x[..., max(0, i - window + 1) : i + 1] for every i along the last
+    axis, ignoring NaN (NaN only when the whole window is NaN). Computed once
+    for all frames.
+    """
+    pad = np.full(x.shape[:-1] + (window - 1,), np.nan, dtype=x.dtype)
+    padded = np.concatenate([pad, x], axis=-1)
+    return np.fmax.reduce(sliding_window_view(padded, window, axis=-1), axis=-1)
+
+
+def decimate(t: np.ndarray, rows: np.ndarray, buckets: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Per-bucket min/max decimation of rows (channels, n) sampled at t, giving
+    2 * buckets points per row. The oldest n % buckets samples are dropped so
+    the newest sample stays in the last bucket. NaN is ignored unless a whole
+    bucket is NaN.
+    """
+    size = len(t) // buckets
+    keep = buckets * size
+    t_b = t[len(t) - keep:].reshape(buckets, size)
+    y_b = rows[:, rows.shape[1] - keep:].reshape(rows.shape[0], buckets, size)
+    t_dec = np.stack([t_b[:, 0], t_b[:, -1]], axis=1).ravel()
+    y_dec = np.stack([np.fmin.reduce(y_b, axis=-1), np.fmax.reduce(y_b, axis=-1)], axis=-1)
+    return t_dec, y_dec.reshape(rows.shape[0], -1)
+
+
+def nice_ceil(v: np.ndarray, step: float | None = None) -> np.ndarray:
+    """Round up to a multiple of `step`, or to half a decade when step is None."""
+    if step is None:
+        step = 10.0 ** np.floor(np.log10(v)) / 2
+    return np.ceil(v / step) * step
 
 
 def main():
@@ -26,25 +66,52 @@ def main():
     parser.add_argument("--data-dir", type=Path, default=Path("Delay_Scan_Data"))
     parser.add_argument("--window", type=int, default=60, help="Window size in seconds (data samples) to display.")
     parser.add_argument("--interval", type=int, default=500, help="Frame interval in ms.")
+    parser.add_argument("--save", type=Path, default=None,
+                        help="Render the playback to this video file (e.g. playback.mp4) instead of showing it.")
+    parser.add_argument("--codec", default="h264",
+                        help="FFmpeg video codec for --save (e.g. h264_nvenc for NVIDIA hardware encoding).")
     args = parser.parse_args()
+    if args.save is not None:
+        if not animation.writers.is_available("ffmpeg"):
+            raise SystemExit("--save needs ffmpeg on PATH.")
+        # Frames go straight to the encoder; no GUI event loop in between.
+        plt.switch_backend("Agg")
 
     csv_path = args.data_dir / "timeseries.csv"
     if not csv_path.exists():
         raise SystemExit(f"timeseries.csv not found at {csv_path}. Run plot_timeseries_all.py first.")
 
-    df = pd.read_csv(csv_path)
-    if "second" not in df.columns:
+    columns = set(pd.read_csv(csv_path, nrows=0).columns)
+    if "second" not in columns:
         raise SystemExit("timeseries.csv missing 'second' column.")
 
     # Determine available channels
-    required = ["HH", "VV", "HV", "VH", "total_visibility", "total_qber"]
-    for col in required:
-        if col not in df.columns:
-            raise SystemExit(f"timeseries.csv missing required column: {col}")
-    has_da = {"DD", "AA", "DA", "AD"} <= set(df.columns)
-
-    t_all = df["second"].to_numpy()
-    data = {col: df[col].to_numpy() for col in df.columns if col != "second"}
+    missing = {"HH", "VV", "HV", "VH", "total_visibility", "total_qber"} - columns
+    if missing:
+        raise SystemExit(f"timeseries.csv missing required columns: {', '.join(sorted(missing))}")
+    has_da = {"DD", "AA", "DA", "AD"} <= columns
+
+    coinc_keys = ["HH", "VV", "HV", "VH"] + (["DD", "AA", "DA", "AD"] if has_da else [])
+    channels = coinc_keys + ["total_visibility", "total_qber"]
+    # Every column is numeric (blank cells are NaN), so the C parser writes
+    # float32 channels directly. Parsing in chunks and keeping only each
+    # chunk's transposed block bounds the extra memory to one chunk instead
+    # of a whole float64 DataFrame next to the final matrix.
+    t_parts, m_parts = [], []
+    with pd.read_csv(csv_path, engine="c", usecols=["second"] + channels,
+                     dtype={"second": np.float64, **dict.fromkeys(channels, np.float32)},
+                     chunksize=CHUNK_ROWS) as reader:
+        for chunk in reader:
+            t_parts.append(chunk["second"].to_numpy())
+            m_parts.append(chunk[channels].to_numpy().T)
+    t_all = np.concatenate(t_parts)
+    # One (channels, samples) float32 matrix: coincidence rows in coinc_keys
+    # order, then visibility and QBER in percent. A frame's window is a single
+    # M[:, start:end] view with unit stride along each row.
+    M = np.concatenate(m_parts, axis=1)
+    n_coinc = len(coinc_keys)
+    VIS, QBER = n_coinc, n_coinc + 1
+    M[VIS:] *= 100.0
 
     # Matplotlib setup (single figure with two rows)
     fig = plt.figure(figsize=(12, 8))
@@ -63,101 +130,117 @@ def main():
         line_da, = ax_coinc.plot([], [], label="DA", color="tab:pink")
         line_ad, = ax_coinc.plot([], [], label="AD", color="tab:gray")
 
+    coinc_lines = [line_hh, line_vv, line_hv, line_vh]
+    if has_da:
+        coinc_lines += [line_dd, line_aa, line_da, line_ad]
+
+    # Per-frame y-limits from rolling window extremes, precomputed for every
+    # frame and rounded outward so they only change when the data leaves the
+    # current range. update() is then just array lookups.
+    # All extremes come from one windowed pass: maxima of every row, plus the
+    # visibility/QBER minima as maxima of their negated rows.
+    ext = rolling_max(np.concatenate([M, -M[VIS:]]), args.window)
+    coinc_top = nice_ceil(np.fmax(np.fmax.reduce(ext[:n_coinc], axis=0), 1) * 1.1)
+    vis_hi, q_hi = nice_ceil(np.fmax(ext[VIS:QBER + 1], 0) + 5, 5)
+    vis_lo, q_lo = -nice_ceil(np.fmax(ext[QBER + 1:], 0) + 5, 5)
+
+    # Blitting only redraws the returned line artists, so labels and legends
+    # are fixed up front and x runs over the window (seconds since the window
+    # start). y-limits are set here and changed in update() only when needed.
+    xlim = (-0.5, args.window - 0.5)
+    ax_coinc.set_xlim(*xlim)
+    ax_coinc.set_ylim(0, coinc_top[0])
+    ax_coinc.set_xlabel("Seconds in window")
     ax_coinc.set_ylabel("Coincidences")
     ax_coinc.set_title("Coincidences (same & cross)")
     ax_coinc.grid(True, alpha=0.3)
-    ax_coinc.legend()
+    ax_coinc.legend(loc="upper left", ncol=2)
 
     # Total visibility/QBER (same figure, second row, twin y)
     ax_tot = fig.add_subplot(gs[1, 0])
     ax_q = ax_tot.twinx()
     line_vis, = ax_tot.plot([], [], label="Total visibility", color="tab:blue")
     line_q, = ax_q.plot([], [], label="Total QBER", color="tab:red", linestyle="--")
+    ax_tot.set_xlim(*xlim)
+    ax_tot.set_ylim(vis_lo[0], vis_hi[0])
+    ax_q.set_ylim(q_lo[0], q_hi[0])
     ax_tot.set_ylabel("Visibility (%)", color="tab:blue")
     ax_q.set_ylabel("QBER (%)", color="tab:red")
     ax_tot.tick_params(axis="y", labelcolor="tab:blue")
     ax_q.tick_params(axis="y", labelcolor="tab:red")
     ax_tot.grid(True, alpha=0.3)
-    ax_tot.set_xlabel("Global seconds")
+    ax_tot.set_xlabel("Seconds in window")
+    lines1, labels1 = ax_tot.get_legend_handles_labels()
+    lines2, labels2 = ax_q.get_legend_handles_labels()
+    ax_tot.legend(lines1 + lines2, labels1 + labels2, loc="upper right")
+
+    # Latest-value readouts as text artists inside the axes: updating their
+    # strings keeps the legends static and lets blitting redraw just them.
+    readout = dict(fontsize=9, bbox=dict(facecolor="white", alpha=0.7, edgecolor="none", pad=1))
+    coinc_texts = [
+        ax_coinc.text(0.99, 0.97 - 0.05 * row, "", transform=ax_coinc.transAxes,
+                      ha="right", va="top", color=line.get_color(), **readout)
+        for row, line in enumerate(coinc_lines)
+    ]
+    vis_text = ax_tot.text(0.99, 0.17, "", transform=ax_tot.transAxes,
+                           ha="right", va="bottom", color=line_vis.get_color(), **readout)
+    q_text = ax_tot.text(0.99, 0.05, "", transform=ax_tot.transAxes,
+                         ha="right", va="bottom", color=line_q.get_color(), **readout)
+
+    # Agg rasterizes every vertex even when many share a pixel column, so
+    # windows longer than ~2 points per pixel are drawn min/max decimated.
+    px = int(fig.get_size_inches()[0] * fig.dpi)
+
+    artists = tuple(coinc_lines) + (line_vis, line_q) + tuple(coinc_texts) + (vis_text, q_text)
+    shown_lims = (coinc_top[0], vis_lo[0], vis_hi[0], q_lo[0], q_hi[0])
 
     def update(frame):
+        nonlocal shown_lims
         start = max(0, frame - args.window + 1)
         end = frame + 1
         if end <= start:
-            return ()
-        t = t_all[start:end]
-        xlo, xhi = t[0] - 0.5, t[-1] + 0.5
+            return artists
+        t = t_all[start:end] - t_all[start]
+        win = M[:, start:end]
+        t_draw, win_draw = decimate(t, win, px) if end - start > 2 * px else (t, win)
 
         # Coincidences
-        seg = {k: data[k][start:end] for k in data.keys()}
-        line_hh.set_data(t, seg["HH"])
-        line_vv.set_data(t, seg["VV"])
-        line_hv.set_data(t, seg["HV"])
-        line_vh.set_data(t, seg["VH"])
-        if has_da:
-            line_dd.set_data(t, seg["DD"])
-            line_aa.set_data(t, seg["AA"])
-            line_da.set_data(t, seg["DA"])
-            line_ad.set_data(t, seg["AD"])
-
-        y_candidates = [
-            np.nanmax(seg["HH"]), np.nanmax(seg["VV"]),
-            np.nanmax(seg["HV"]), np.nanmax(seg["VH"])
-        ]
-        if has_da:
-            y_candidates += [
-                np.nanmax(seg["DD"]), np.nanmax(seg["AA"]),
-                np.nanmax(seg["DA"]), np.nanmax(seg["AD"])
-            ]
-        y_max = max([c for c in y_candidates if np.isfinite(c)] + [1])
-        ax_coinc.set_xlim(xlo, xhi)
-        ax_coinc.set_ylim(0, y_max * 1.1)
-        ax_coinc.set_xlabel("Global seconds")
-
-        # Update legend labels with latest values
-        latest = {k: seg[k][-1] if len(seg[k]) else np.nan for k in seg}
-        line_hh.set_label(f"HH ({latest.get('HH', float('nan')):.0f})")
-        line_vv.set_label(f"VV ({latest.get('VV', float('nan')):.0f})")
-        line_hv.set_label(f"HV ({latest.get('HV', float('nan')):.0f})")
-        line_vh.set_label(f"VH ({latest.get('VH', float('nan')):.0f})")
-        if has_da:
-            line_dd.set_label(f"DD ({latest.get('DD', float('nan')):.0f})")
-            line_aa.set_label(f"AA ({latest.get('AA', float('nan')):.0f})")
-            line_da.set_label(f"DA ({latest.get('DA', float('nan')):.0f})")
-            line_ad.set_label(f"AD ({latest.get('AD', float('nan')):.0f})")
-        ax_coinc.legend(loc="upper left", ncol=2)
+        for key, row, row_draw, line, text in zip(coinc_keys, win, win_draw, coinc_lines, coinc_texts):
+            line.set_data(t_draw, row_draw)
+            text.set_text(f"{key} {row[-1]:.0f}")
 
         # Total vis/QBER
-        vis = seg["total_visibility"] * 100.0
-        qber = seg["total_qber"] * 100.0
-        line_vis.set_data(t, vis)
-        line_q.set_data(t, qber)
-        ax_tot.set_xlim(xlo, xhi)
-        if len(vis):
-            ax_tot.set_ylim(min(np.nanmin(vis), 0) - 5, max(np.nanmax(vis), 0) + 5)
-            ax_q.set_ylim(min(np.nanmin(qber), 0) - 5, max(np.nanmax(qber), 0) + 5)
-
-        # Update legend labels with latest vis/qber
-        if len(vis):
-            line_vis.set_label(f"Total visibility ({vis[-1]:.2f}%)")
-        if len(qber):
-            line_q.set_label(f"Total QBER ({qber[-1]:.2f}%)")
-        lines1, labels1 = ax_tot.get_legend_handles_labels()
-        lines2, labels2 = ax_q.get_legend_handles_labels()
-        ax_tot.legend(lines1 + lines2, labels1 + labels2, loc="upper right")
-
-        return ()
+        line_vis.set_data(t_draw, win_draw[VIS])
+        line_q.set_data(t_draw, win_draw[QBER])
+        vis_text.set_text(f"Total visibility {win[VIS, -1]:.2f}%")
+        q_text.set_text(f"Total QBER {win[QBER, -1]:.2f}%")
+
+        lims = (coinc_top[frame], vis_lo[frame], vis_hi[frame], q_lo[frame], q_hi[frame])
+        if lims != shown_lims:
+            # New limits invalidate the blit background (ticks/grid); redraw the
+            # static parts once, the animated lines are skipped by draw().
+            ax_coinc.set_ylim(0, lims[0])
+            ax_tot.set_ylim(lims[1], lims[2])
+            ax_q.set_ylim(lims[3], lims[4])
+            fig.canvas.draw()
+            shown_lims = lims
+
+        return artists
 
     ani = animation.FuncAnimation(
         fig,
         update,
         frames=len(t_all),
         interval=args.interval,
-        blit=False,
+        blit=True,
         repeat=False,
     )
 
-    plt.show()
+    if args.save is not None:
+        writer = animation.FFMpegWriter(fps=1000 / args.interval, codec=args.codec, bitrate=4000)
+        ani.save(args.save, writer=writer, dpi=90)
+    else:
+        plt.show()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
-import numpy as np, pandas as pd, sys
+import numpy as np, pandas as pd, sys, os
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.colors import Normalize
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 # ===================================
@@ -8,7 +12,8 @@ from pathlib import Path
 Setup_4 = False  # Change to True for 4-detector setup
 
 data_dir = Path("Delay_Scan_Data")
-names = ["delay_ns", "coinc"]
+data_dir_str = str(data_dir)
+scan_cache_path = data_dir / "scan_cache.npz"  # binary copy of parsed scans
 end_time = sys.argv[1]
 seconds = range(0, int(end_time))
 
@@ -40,97 +45,151 @@ else:
 # ===================================
 # 3. Helper Functions
 # ===================================
+def _open_scan_cache():
+    """
+    Return {"i_j_k": (L, 2) delay/coinc array} from scan_cache.npz, or {} when
+    the cache is missing or older than any delay-scan CSV.
+    """
+    if not scan_cache_path.exists():
+        return {}
+    cache_mtime = scan_cache_path.stat().st_mtime
+    if any(f.stat().st_mtime > cache_mtime for f in data_dir.glob("delay_scan_*_second_*.csv")):
+        return {}
+    with np.load(scan_cache_path) as npz:
+        return {key: npz[key] for key in npz.files}
+
+
+_scan_cache = _open_scan_cache()
+_scan_cache_dirty = False
+
+
+@lru_cache(maxsize=None)
+def _load_scan(i, j, k):
+    """
+    Return (delay_ns, coinc) arrays for a pair and second, sorted by delay, or
+    None if the file is missing/empty. Cached: every scan file is parsed at
+    most once even though the plots, metrics and trends all look at the same
+    seconds.
+    """
+    global _scan_cache_dirty
+    key = f"{i}_{j}_{k}"
+    if key in _scan_cache:
+        return _scan_cache[key][:, 0], _scan_cache[key][:, 1]
+    # Plain string path and a single stat call; no Path object per scan
+    f = f"{data_dir_str}/delay_scan_{i}_vs_{j}_second_{k}.csv"
+    try:
+        if os.path.getsize(f) == 0:
+            return None
+    except OSError:
+        return None  # missing
+    # Two purely numeric columns: np.loadtxt skips pandas' DataFrame build and
+    # type inference, which dominate for files this small. float32 holds the
+    # integer counts exactly and the delays to well below a bin width.
+    scan = np.loadtxt(f, delimiter=",", ndmin=2, dtype=np.float32)
+    if len(scan) == 0:
+        return None
+    delay, coinc = scan[:, 0], scan[:, 1]
+    if np.any(delay[1:] < delay[:-1]):
+        order = np.argsort(delay, kind="stable")
+        delay, coinc = delay[order], coinc[order]
+    _scan_cache[key] = np.column_stack([delay, coinc])
+    _scan_cache_dirty = True
+    return delay, coinc
+
+
+@lru_cache(maxsize=None)
 def get_peak_delay_and_count(i, j, k):
     """Return (delay_at_max, max_count) for a given pair and second."""
-    f = data_dir / f"delay_scan_{i}_vs_{j}_second_{k}.csv"
-    if not f.exists():
-        return None, 0
-    df = pd.read_csv(f, names=names)
-    if df.empty:
+    scan = _load_scan(i, j, k)
+    if scan is None:
         return None, 0
-    idx_max = df["coinc"].idxmax()
-    delay_at_max = df.loc[idx_max, "delay_ns"]
-    max_count = df.loc[idx_max, "coinc"]
-    return delay_at_max, max_count
-
-
-def get_count_at_delay(i, j, k, delay_target):
-    """Return coincidence count at a given delay (nearest value)."""
-    f = data_dir / f"delay_scan_{i}_vs_{j}_second_{k}.csv"
-    if not f.exists():
-        return 0
-    df = pd.read_csv(f, names=names)
-    if df.empty:
-        return 0
-    # Find the coincidence closest to the target delay
-    idx = (df["delay_ns"] - delay_target).abs().idxmin()
-    return df.loc[idx, "coinc"]
-
-
-def counts_same_opp(k, same_pairs, opp_pairs):
+    delay, coinc = scan
+    idx_max = np.argmax(coinc)
+    return delay[idx_max], coinc[idx_max]
+
+
+def _scan_stack(i, j):
     """
-    For each same/opp pair, ensure opposite coincidence is evaluated
-    at the delay where the same pair peaks.
+    Return (delay, coinc) arrays of shape (n_seconds, L) holding every scan of
+    a pair, one row per second. Shorter and missing scans are padded with
+    delay=inf and coinc=-inf, so padding never wins an argmax/argmin.
     """
-    C_same_total, C_opp_total = 0, 0
-    for (same_i, same_j), (opp_i, opp_j) in zip(same_pairs, opp_pairs):
-        delay_peak, C_same = get_peak_delay_and_count(same_i, same_j, k)
-        if delay_peak is None:
-            continue
-        C_opp = get_count_at_delay(opp_i, opp_j, k, delay_peak)
-        C_same_total += C_same
-        C_opp_total += C_opp
-    return C_same_total, C_opp_total
+    # Threads rather than processes: this script does its work at import time,
+    # which spawned workers would re-run.
+    with ThreadPoolExecutor() as ex:
+        scans = list(ex.map(lambda k: _load_scan(i, j, k), seconds))
+    width = max((len(scan[0]) for scan in scans if scan is not None), default=1)
+    delay = np.full((len(scans), width), np.inf, dtype=np.float32)
+    coinc = np.full((len(scans), width), -np.inf, dtype=np.float32)
+    for row, scan in enumerate(scans):
+        if scan is not None:
+            delay[row, :len(scan[0])] = scan[0]
+            coinc[row, :len(scan[1])] = scan[1]
+    return delay, coinc
 
 
 def compute_metrics(same_pairs, opp_pairs):
     """Compute visibility, contrast, QBER per second."""
-    V, CR, Q, C_same_all, C_opp_all = [], [], [], [], []
-    for k in seconds:
-        C_same, C_opp = counts_same_opp(k, same_pairs, opp_pairs)
-        C_same_all.append(C_same)
-        C_opp_all.append(C_opp)
-        T = C_same + C_opp
-        if T == 0 or C_opp == 0:
-            V.append(np.nan); CR.append(np.nan); Q.append(np.nan)
-            continue
-        v  = (C_same - C_opp) / T
-        cr = C_same / C_opp
-        V.append(v)
-        CR.append(cr)
-        Q.append(C_opp / T)
-    return np.array(V), np.array(CR), np.array(Q), np.array(C_same_all), np.array(C_opp_all)
+    # For each same/opp pair, the opposite coincidence is evaluated at the
+    # delay where the same pair peaks; all seconds at once on stacked scans.
+    rows = np.arange(len(seconds))
+    C_same_all = np.zeros(len(seconds))
+    C_opp_all = np.zeros(len(seconds))
+    for same_pair, opp_pair in zip(same_pairs, opp_pairs):
+        same_delay, same_coinc = _scan_stack(*same_pair)
+        opp_delay, opp_coinc = _scan_stack(*opp_pair)
+        peak = np.argmax(same_coinc, axis=1)
+        # Nearest opposite delay; argmin takes the first (lower) delay on ties.
+        # Seconds without a same scan compute inf - inf here (NaN, silenced);
+        # has_same masks them out below.
+        with np.errstate(invalid="ignore"):
+            nearest = np.argmin(np.abs(opp_delay - same_delay[rows, peak, None]), axis=1)
+        has_same = np.isfinite(same_delay[:, 0])
+        has_opp = has_same & np.isfinite(opp_delay[:, 0])
+        C_same_all += np.where(has_same, same_coinc[rows, peak], 0)
+        C_opp_all += np.where(has_opp, opp_coinc[rows, nearest], 0)
+    T = C_same_all + C_opp_all
+    # Seconds with no coincidences or no opposite counts stay NaN
+    valid = (T != 0) & (C_opp_all != 0)
+    V = np.divide(C_same_all - C_opp_all, T, out=np.full_like(T, np.nan), where=valid)
+    CR = np.divide(C_same_all, C_opp_all, out=np.full_like(T, np.nan), where=valid)
+    Q = np.divide(C_opp_all, T, out=np.full_like(T, np.nan), where=valid)
+    return V, CR, Q, C_same_all, C_opp_all
 
 # ===================================
 # 4. Plot All Delay Scans
 # ===================================
-global_max = 0
-for (i, j) in pairs.values():
-    for k in seconds:
-        f = data_dir / f"delay_scan_{i}_vs_{j}_second_{k}.csv"
-        if not f.exists():
-            continue
-        df = pd.read_csv(f, names=["delay_ns", "coincidences"])
-        if not df.empty:
-            global_max = max(global_max, df["coincidences"].max())
-
 fig, axes = plt.subplots(len(pairs), 1, figsize=(8, 6), sharex=True)
 if len(pairs) == 1:
     axes = [axes]
+# One pass: collect each pair's scans into a single LineCollection (one artist
+# per axis instead of one Line2D per second), coloured by second, and track the
+# shared y-limit as we go
+global_max = 0
+second_norm = Normalize(1, max(len(seconds), 2))
+lc = None
 for ax, (label, (i, j)) in zip(axes, pairs.items()):
+    segments, scan_seconds = [], []
     for k in seconds:
-        f = data_dir / f"delay_scan_{i}_vs_{j}_second_{k}.csv"
-        if not f.exists():
+        scan = _load_scan(i, j, k)
+        if scan is None:
             continue
-        df = pd.read_csv(f, names=["delay_ns", "coincidences"])
-        ax.plot(df["delay_ns"], df["coincidences"], label=f"s {k+1}")
-    ax.set_ylim(0, global_max * 1.1)
+        global_max = max(global_max, scan[1].max())
+        segments.append(np.column_stack(scan))
+        scan_seconds.append(k + 1)
+    lc = LineCollection(segments, cmap="viridis", norm=second_norm)
+    lc.set_array(np.asarray(scan_seconds))
+    ax.add_collection(lc)
+    ax.autoscale_view()
     ax.set_title(label)
     ax.set_ylabel("Coincidences")
-    ax.legend(fontsize=8)
     ax.grid(True)
+for ax in axes:
+    ax.set_ylim(0, global_max * 1.1)
 axes[-1].set_xlabel("Relative delay (ns)")
 plt.tight_layout()
+if lc is not None:
+    fig.colorbar(lc, ax=axes, label="Second")
 plt.show()
 
 # ===================================
@@ -201,6 +260,14 @@ else:
     plt.tight_layout()
     plt.show()
 
+# Every scan has been read by now; store newly parsed ones so the next run can
+# skip the CSVs (uncompressed, so loading is a plain read).
+if _scan_cache_dirty:
+    try:
+        np.savez(scan_cache_path, **_scan_cache)
+    except OSError:
+        pass  # read-only data dir: just parse the CSVs again next time
+
 # ===================================
 # 7. Visibility, Contrast, QBER Plots
 # ===================================
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Concatenate and plot every CoincEvents/*/rate.csv back-to-back.
+Concatenate and plot every CoincEvents/*/rate.csv back-to-back. Each parsed
+rate.csv is cached as rate.npz beside it for faster re-runs.
 
 Usage: adjust the variables in the “Config” section below, then run
   python plot_rate_consecutive.py
@@ -8,6 +9,7 @@ Usage: adjust the variables in the “Config” section below, then run
 from __future__ import annotations
 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple
 
@@ -15,6 +17,52 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 
+# Pair labels CoincPairs writes to rate.csv
+PAIR_LABELS = ["HH", "VV", "HV", "VH", "DD", "AA", "DA", "AD"]
+
+
+def read_rate_csv(csv_path: Path) -> pd.DataFrame:
+    """
+    Read one rate.csv. The first read also writes a rate.npz sidecar next to
+    it (one plain array per column), which later runs load instead of parsing
+    the text, as long as it is at least as new as the CSV.
+    """
+    cache = csv_path.with_suffix(".npz")
+    if cache.exists() and cache.stat().st_mtime >= csv_path.stat().st_mtime:
+        with np.load(cache) as data:
+            return pd.DataFrame({col: data[col] for col in data.files})
+
+    df = pd.read_csv(csv_path)
+    # Text columns (pair) are stored as fixed-width unicode so np.load never
+    # needs pickle.
+    arrays = {
+        col: df[col].to_numpy() if pd.api.types.is_numeric_dtype(df[col]) else df[col].to_numpy(dtype=str)
+        for col in df.columns
+    }
+    try:
+        np.savez(cache, **arrays)
+    except OSError:
+        pass  # read-only run folder: just parse the CSV again next time
+    return df
+
+
+def _load_run(folder: Path) -> pd.DataFrame | None:
+    """Read and normalize one run's rate.csv (unsorted), or None when it is missing/unusable."""
+    csv_path = folder / "rate.csv"
+    if not csv_path.exists():
+        return None
+
+    df = read_rate_csv(csv_path)
+    if df.empty or "second" not in df or "pair" not in df or "coincidences" not in df:
+        return None
+
+    # Small fixed vocabulary and counts: int8 category codes and int32
+    # columns keep the concatenated table small and its sort/groupby cheap.
+    df["pair"] = pd.Categorical(df["pair"], categories=PAIR_LABELS)
+    df["second"] = df["second"].astype(np.int32)
+    df["coincidences"] = df["coincidences"].astype(np.int32)
+    return df
+
 
 def load_rate_tables(data_dir: Path) -> Tuple[pd.DataFrame, List[int]]:
     """
@@ -23,21 +71,17 @@ def load_rate_tables(data_dir: Path) -> Tuple[pd.DataFrame, List[int]]:
     where runs change for optional vertical markers.
     """
     folders = sorted(p for p in data_dir.iterdir() if p.is_dir())
+    # Runs are independent and pandas' C parser releases the GIL, so they are
+    # read on threads; offsets are assigned afterwards in folder order.
+    with ThreadPoolExecutor(max_workers=min(16, max(1, len(folders)))) as ex:
+        runs = list(ex.map(_load_run, folders))
+
     frames: List[pd.DataFrame] = []
     boundaries: List[int] = []
     offset = 0
-
-    for folder in folders:
-        csv_path = folder / "rate.csv"
-        if not csv_path.exists():
-            continue
-
-        df = pd.read_csv(csv_path)
-        if df.empty or "second" not in df or "pair" not in df or "coincidences" not in df:
+    for folder, df in zip(folders, runs):
+        if df is None:
             continue
-
-        # Ensure predictable ordering inside each run.
-        df = df.sort_values(["second", "pair"]).reset_index(drop=True)
         df["abs_second"] = df["second"] + offset
         df["run"] = folder.name
         frames.append(df)
@@ -46,7 +90,12 @@ def load_rate_tables(data_dir: Path) -> Tuple[pd.DataFrame, List[int]]:
         offset += last_sec + 1  # +1 because seconds are inclusive
         boundaries.append(offset)
 
-    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not frames:
+        return pd.DataFrame(), boundaries
+    # One sort over the combined table (abs_second keeps runs in order)
+    # gives predictable ordering inside each run.
+    combined = pd.concat(frames, ignore_index=True)
+    combined.sort_values(["abs_second", "pair"], kind="stable", ignore_index=True, inplace=True)
     return combined, boundaries
 
 
@@ -58,62 +107,52 @@ def compute_vis_qber(df: pd.DataFrame) -> pd.DataFrame:
       DA basis: same = DD+AA, opp = DA+AD
       vis = (same - opp) / (same + opp); qber = opp / (same + opp)
       Total = mean of HV and DA (ignoring missing basis).
-    Returns wide DataFrame with vis/qber columns.
+    Returns wide DataFrame with float64 vis/qber/total columns.
     """
     if df.empty:
         raise SystemExit("No rate.csv data found to plot.")
 
-    pivot = df.pivot_table(index="abs_second", columns="pair", values="coincidences", aggfunc="sum").fillna(0)
-    pivot = pivot.sort_index()
-
-    def get(col):
-        return pivot[col] if col in pivot else 0
-
-    hh, vv, hv, vh = get("HH"), get("VV"), get("HV"), get("VH")
-    dd, aa, da, ad = get("DD"), get("AA"), get("DA"), get("AD")
-
-    total_coinc = pivot.sum(axis=1)
-
-    # Drop low-count seconds from all downstream calculations
-    mask_ok = total_coinc >= 40
-    pivot = pivot[mask_ok]
-    total_coinc = total_coinc[mask_ok]
+    pivot = (
+        df.groupby(["abs_second", "pair"], sort=True, observed=True)["coincidences"]
+        .sum()
+        .unstack("pair", fill_value=0)
+    )
 
-    hh = pivot["HH"] if "HH" in pivot else 0
-    vv = pivot["VV"] if "VV" in pivot else 0
-    hv = pivot["HV"] if "HV" in pivot else 0
-    vh = pivot["VH"] if "VH" in pivot else 0
-    dd = pivot["DD"] if "DD" in pivot else 0
-    aa = pivot["AA"] if "AA" in pivot else 0
-    da = pivot["DA"] if "DA" in pivot else 0
-    ad = pivot["AD"] if "AD" in pivot else 0
+    # Plain float arrays from here on; absent pairs count as 0. Low-count
+    # seconds are dropped from all downstream calculations with one mask.
+    total_coinc = pivot.sum(axis=1).to_numpy(dtype=np.float64)
+    keep = total_coinc >= 40
+    total_coinc = total_coinc[keep]
+    abs_second = pivot.index.to_numpy()[keep]
+    hh, vv, hv, vh, dd, aa, da, ad = (
+        pivot.reindex(columns=PAIR_LABELS, fill_value=0).to_numpy(dtype=np.float64)[keep].T
+    )
 
-    hv_same = hh + vv
-    hv_opp = hv + vh
-    hv_total = hv_same + hv_opp
-    vis_hv = (hv_same - hv_opp) / hv_total.replace(0, pd.NA)
-    qber_hv = hv_opp / hv_total.replace(0, pd.NA)
+    def basis_vis_qber(same, opp):
+        # NaN for empty bases and negative visibilities (and their QBER)
+        total = same + opp
+        vis = np.divide(same - opp, total, out=np.full_like(total, np.nan), where=total > 0)
+        qber = np.divide(opp, total, out=np.full_like(total, np.nan), where=total > 0)
+        bad = vis < 0
+        vis[bad] = np.nan
+        qber[bad] = np.nan
+        return vis, qber
 
-    da_same = dd + aa
-    da_opp = da + ad
-    da_total = da_same + da_opp
-    vis_da = (da_same - da_opp) / da_total.replace(0, pd.NA)
-    qber_da = da_opp / da_total.replace(0, pd.NA)
+    vis_hv, qber_hv = basis_vis_qber(hh + vv, hv + vh)
+    vis_da, qber_da = basis_vis_qber(dd + aa, da + ad)
 
-    # Filter out negative visibility values (and their paired QBER)
-    vis_hv = vis_hv.mask(vis_hv < 0)
-    qber_hv = qber_hv.mask(vis_hv.isna())
-    vis_da = vis_da.mask(vis_da < 0)
-    qber_da = qber_da.mask(vis_da.isna())
+    def mean_of_bases(a, b):
+        # Mean over the bases that have a value
+        return np.where(np.isnan(a), b, np.where(np.isnan(b), a, (a + b) / 2))
 
-    vis_total = pd.concat([vis_hv, vis_da], axis=1).mean(axis=1, skipna=True)
-    qber_total = pd.concat([qber_hv, qber_da], axis=1).mean(axis=1, skipna=True)
+    vis_total = mean_of_bases(vis_hv, vis_da)
+    qber_total = mean_of_bases(qber_hv, qber_da)
 
     brightness = total_coinc / (0.8 * 1.58)  # given definition
 
     return pd.DataFrame(
         {
-            "abs_second": pivot.index,
+            "abs_second": abs_second,
             "vis_hv": vis_hv,
             "qber_hv": qber_hv,
             "vis_da": vis_da,
@@ -123,18 +162,31 @@ def compute_vis_qber(df: pd.DataFrame) -> pd.DataFrame:
             "total_coinc": total_coinc,
             "brightness": brightness,
         }
-    ).reset_index(drop=True)
+    )
+
+
+def bin_means(metrics: pd.DataFrame, bin_seconds: int) -> pd.DataFrame:
+    """
+    Mean of every column over consecutive bin_seconds-wide abs_second bins
+    (NaN ignored), so long runs are drawn with a few thousand points.
+    """
+    if bin_seconds <= 1:
+        return metrics
+    return metrics.groupby(metrics["abs_second"] // bin_seconds).mean().reset_index(drop=True)
 
 
-def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path) -> None:
-    """Plot visibility and QBER (%) across absolute seconds."""
+def plot_vis_qber(
+    metrics: pd.DataFrame, boundaries: List[int], out_path: Path, bin_seconds: int = 1, dpi: int = 150
+) -> None:
+    """
+    Plot visibility and QBER (%) across absolute seconds, drawing bin means
+    when bin_seconds > 1. Legend statistics always use the per-second values.
+    """
     if metrics.empty:
         raise SystemExit("No visibility/QBER data to plot.")
 
-    m = metrics.copy()
-    for col in m.columns:
-        if col != "abs_second":
-            m[col] = m[col].replace(pd.NA, np.nan).astype(float)
+    m = metrics
+    binned = bin_means(m, bin_seconds)
 
     def fmt_stats(series: pd.Series, percent=True) -> str:
         vals = series.dropna()
@@ -147,7 +199,7 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
             std *= 100
         return f"mean={mean:.2f}%, std={std:.2f}%"
 
-    t = m["abs_second"]
+    t = binned["abs_second"].to_numpy()
     fig, ax_vis = plt.subplots(figsize=(12, 6))
     ax_q = ax_vis.twinx()
 
@@ -157,7 +209,7 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
     vis_lines.append(
         ax_vis.plot(
             t,
-            m["vis_total"] * 100,
+            binned["vis_total"].to_numpy() * 100,
             label=f"Total visibility ({fmt_stats(m['vis_total'])})",
             color="tab:blue",
         )[0]
@@ -165,7 +217,7 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
     q_lines.append(
         ax_q.plot(
             t,
-            m["qber_total"] * 100,
+            binned["qber_total"].to_numpy() * 100,
             label=f"Total QBER ({fmt_stats(m['qber_total'])})",
             color="tab:red",
             linestyle="--",
@@ -177,7 +229,7 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
         vis_lines.append(
             ax_vis.plot(
                 t,
-                m["vis_hv"] * 100,
+                binned["vis_hv"].to_numpy() * 100,
                 label=f"HV visibility ({fmt_stats(m['vis_hv'])})",
                 color="tab:green",
                 alpha=0.5,
@@ -187,7 +239,7 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
         vis_lines.append(
             ax_vis.plot(
                 t,
-                m["vis_da"] * 100,
+                binned["vis_da"].to_numpy() * 100,
                 label=f"DA visibility ({fmt_stats(m['vis_da'])})",
                 color="tab:orange",
                 alpha=0.6,
@@ -197,7 +249,7 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
         q_lines.append(
             ax_q.plot(
                 t,
-                m["qber_hv"] * 100,
+                binned["qber_hv"].to_numpy() * 100,
                 label=f"HV QBER ({fmt_stats(m['qber_hv'])})",
                 color="tab:brown",
                 linestyle="--",
@@ -208,7 +260,7 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
         q_lines.append(
             ax_q.plot(
                 t,
-                m["qber_da"] * 100,
+                binned["qber_da"].to_numpy() * 100,
                 label=f"DA QBER ({fmt_stats(m['qber_da'])})",
                 color="tab:pink",
                 linestyle="--",
@@ -216,8 +268,9 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
             )[0]
         )
 
-    for boundary in boundaries[:-1]:
-        ax_vis.axvline(boundary, color="gray", linestyle="--", alpha=0.25, linewidth=0.8)
+    # Run boundaries as one LineCollection spanning the axes height
+    ax_vis.vlines(boundaries[:-1], 0, 1, transform=ax_vis.get_xaxis_transform(),
+                  color="gray", linestyle="--", alpha=0.25, linewidth=0.8)
 
     ax_vis.set_xlabel("Absolute second (concatenated runs)")
     ax_vis.set_ylabel("Visibility (%)")
@@ -231,19 +284,23 @@ def plot_vis_qber(metrics: pd.DataFrame, boundaries: List[int], out_path: Path)
     ax_vis.legend(handles, labels, ncol=3, fontsize=8, loc="upper right")
 
     fig.tight_layout()
-    fig.savefig(out_path, dpi=300)
+    fig.savefig(out_path, dpi=dpi, pil_kwargs={"compress_level": 1})
     print(f"Wrote plot: {out_path}")
 
 
-def plot_totals(metrics: pd.DataFrame, boundaries: List[int], out_path: Path) -> None:
-    """Plot total coincidences and brightness on twin axes, with stats."""
+def plot_totals(
+    metrics: pd.DataFrame, boundaries: List[int], out_path: Path, bin_seconds: int = 1, dpi: int = 150
+) -> None:
+    """
+    Plot total coincidences and brightness on twin axes, with stats. Bin means
+    are drawn when bin_seconds > 1; the stats use the per-second values.
+    """
     if metrics.empty:
         raise SystemExit("No totals data to plot.")
 
-    m = metrics.copy()
-    m["total_coinc"] = m["total_coinc"].astype(float)
-    m["brightness"] = m["brightness"].astype(float)
-    t = m["abs_second"]
+    m = metrics
+    binned = bin_means(m, bin_seconds)
+    t = binned["abs_second"].to_numpy()
 
     def fmt_stats(series: pd.Series) -> str:
         vals = series.dropna()
@@ -254,13 +311,13 @@ def plot_totals(metrics: pd.DataFrame, boundaries: List[int], out_path: Path) ->
     fig, ax_c = plt.subplots(figsize=(12, 6))
     ax_b = ax_c.twinx()
 
-    line_c = ax_c.plot(t, m["total_coinc"], color="tab:blue",
+    line_c = ax_c.plot(t, binned["total_coinc"].to_numpy(), color="tab:blue",
                        label=f"Total coincidences ({fmt_stats(m['total_coinc'])})")[0]
-    line_b = ax_b.plot(t, m["brightness"], color="tab:orange", linestyle="--",
+    line_b = ax_b.plot(t, binned["brightness"].to_numpy(), color="tab:orange", linestyle="--",
                        label=f"Brightness ({fmt_stats(m['brightness'])})")[0]
 
-    for boundary in boundaries[:-1]:
-        ax_c.axvline(boundary, color="gray", linestyle="--", alpha=0.25, linewidth=0.8)
+    ax_c.vlines(boundaries[:-1], 0, 1, transform=ax_c.get_xaxis_transform(),
+                color="gray", linestyle="--", alpha=0.25, linewidth=0.8)
 
     ax_c.set_xlabel("Absolute second (concatenated runs)")
     ax_c.set_ylabel("Total coincidences")
@@ -273,7 +330,7 @@ def plot_totals(metrics: pd.DataFrame, boundaries: List[int], out_path: Path) ->
     ax_c.legend(handles, labels, ncol=2, fontsize=8, loc="upper right")
 
     fig.tight_layout()
-    fig.savefig(out_path, dpi=300)
+    fig.savefig(out_path, dpi=dpi, pil_kwargs={"compress_level": 1})
     print(f"Wrote plot: {out_path}")
 
 
@@ -287,6 +344,11 @@ def main():
     out_totals_png = Path("totals_brightness_consecutive.png")  # totals/brightness plot
     plot_only_csv: Path | None = None        # if set, plot this CSV directly instead of aggregating
     plot_stride = 1                          # take every Nth point when plotting (>=1)
+    bin_seconds: int | None = None           # plot means over N-second bins (None = auto, ~4000 points)
+    dpi = 150                                # PNG resolution (300 for publication figures)
+
+    # Draw long paths in chunks and drop sub-pixel vertices when rendering
+    plt.rcParams.update({"agg.path.chunksize": 10000, "path.simplify": True})
 
     if plot_only_csv is not None:
         csv_path = plot_only_csv
@@ -316,8 +378,10 @@ def main():
     if plot_stride > 1:
         metrics = metrics.iloc[::plot_stride].reset_index(drop=True)
         boundaries = [b for b in boundaries if b % plot_stride == 0]
-    plot_vis_qber(metrics, boundaries, out_png)
-    plot_totals(metrics, boundaries, out_totals_png)
+    if bin_seconds is None:
+        bin_seconds = max(1, len(metrics) // 4000)
+    plot_vis_qber(metrics, boundaries, out_png, bin_seconds, dpi)
+    plot_totals(metrics, boundaries, out_totals_png, bin_seconds, dpi)
 
 
 if __name__ == "__main__":
@@ -84,74 +84,77 @@ def main():
     if args.seconds is not None:
         seconds = [sec for sec in seconds if sec - seconds[0] < args.seconds]
 
-    rows = []
-    singles_per_sec = {ch: [] for ch in singles_map.keys()}
+    # Same + cross pairs in one list; same pairs use their own delay
+    all_pairs = [(lbl, c1, c2, lbl) for lbl, c1, c2 in SAME] + CROSS
+
+    # Per-second results go straight into preallocated arrays (NaN = not
+    # counted: missing channel/delay or an empty bucket)
+    n_sec = len(seconds)
+    coinc = {lbl: np.full(n_sec, np.nan) for lbl, _, _, _ in all_pairs}
+    singles_per_sec = {ch: np.zeros(n_sec, dtype=np.int64) for ch in singles_map.keys()}
 
     # Precompute which channels we actually need
     needed_channels = set(ch for _, ch1, ch2 in SAME for ch in (ch1, ch2))
     needed_channels.update(ch for _, ch1, ch2, _ in CROSS for ch in (ch1, ch2))
 
-    for sec in seconds:
-        row = {"second": sec}
-
-        # Gather buckets once per second for needed channels
-        buckets = {}
-        for ch, s in singles_map.items():
-            idx = sec - s.base_second
-            if 0 <= idx < len(s.events_per_second):
-                buckets[ch] = s.events_per_second[idx]
-            else:
-                buckets[ch] = []
-            singles_per_sec[ch].append(len(buckets[ch]))
-
-        # Same + cross pairs in one pass using a list
-        all_pairs = []
-        for lbl, c1, c2 in SAME:
-            all_pairs.append((lbl, c1, c2, lbl))  # base delay = self
-        for lbl, c1, c2, base in CROSS:
-            all_pairs.append((lbl, c1, c2, base))
-
-        for lbl, c1, c2, base in all_pairs:
-            if base not in delays_ns or c1 not in buckets or c2 not in buckets:
-                row[f"{lbl}_coinc"] = np.nan
-                continue
-            delay_ps = int(delays_ns[base] * 1000)
-            ch1_list = buckets[c1]
-            ch2_list = buckets[c2]
-            if len(ch1_list) == 0 or len(ch2_list) == 0:
-                row[f"{lbl}_coinc"] = np.nan
-                continue
-            ch1 = np.array(ch1_list, dtype=np.int64)
-            ch2 = np.array(ch2_list, dtype=np.int64)
-            row[f"{lbl}_coinc"] = cf.count_coincidences_with_delay_np(
-                ch1, ch2, args.coinc_window_ps, delay_ps)
-
-        hh = row.get("HH_coinc") or 0
-        vv = row.get("VV_coinc") or 0
-        hv = row.get("HV_coinc") or 0
-        vh = row.get("VH_coinc") or 0
-        hv_same = hh + vv
-        hv_opp = hv + vh
-        hv_total = hv_same + hv_opp
-        row["vis_hv"] = (hv_same - hv_opp) / hv_total if hv_total > 0 else np.nan
-        row["qber_hv"] = hv_opp / hv_total if hv_total > 0 else np.nan
-
-        dd = row.get("DD_coinc") or 0
-        aa = row.get("AA_coinc") or 0
-        da = row.get("DA_coinc") or 0
-        ad = row.get("AD_coinc") or 0
-        da_same = dd + aa
-        da_opp = da + ad
-        da_total = da_same + da_opp
-        row["vis_da"] = (da_same - da_opp) / da_total if da_total > 0 else np.nan
-        row["qber_da"] = da_opp / da_total if da_total > 0 else np.nan
-
-        row["vis_total"] = np.nanmean([row["vis_hv"], row["vis_da"]])
-        row["qber_total"] = np.nanmean([row["qber_hv"], row["qber_da"]])
-
-        rows.append(row)
-
-    df = pd.DataFrame(rows).sort_values("second").reset_index(drop=True)
+    # Per-channel buckets for every processed second (empty where a channel has
+    # no data), built only for channels some pair uses. events_per_second is
+    # converted from C++ on each attribute access, so it is read once per
+    # channel; buckets become int64 arrays once and are shared by every pair
+    # using that channel.
+    empty = np.empty(0, dtype=np.int64)
+    sec_arr = np.asarray(seconds, dtype=np.int64)
+    buckets = {}
+    for ch, s in singles_map.items():
+        events = s.events_per_second
+        # Singles: bucket lengths once per channel, aligned to the chosen seconds
+        lengths = np.fromiter(map(len, events), dtype=np.int64, count=len(events))
+        idx = sec_arr - s.base_second
+        in_range = (idx >= 0) & (idx < len(events))
+        singles_per_sec[ch][in_range] = lengths[idx[in_range]]
+        if ch not in needed_channels:
+            continue  # singles only; no pair uses this channel
+        buckets[ch] = [np.array(events[i], dtype=np.int64) if ok else empty
+                       for i, ok in zip(idx.tolist(), in_range.tolist())]
+
+    # Pairs that can be counted at all, with their delay in ps, and which
+    # seconds each channel has events in; both are fixed for the whole run
+    active_pairs = [(lbl, c1, c2, int(delays_ns[base] * 1000))
+                    for lbl, c1, c2, base in all_pairs
+                    if base in delays_ns and c1 in buckets and c2 in buckets]
+    nonempty = {ch: np.fromiter(map(len, b), dtype=np.int64, count=n_sec) > 0 for ch, b in buckets.items()}
+
+    # One batched call per pair covers all seconds (GIL released, OpenMP
+    # across seconds inside the extension)
+    for lbl, c1, c2, delay_ps in active_pairs:
+        counts = cf.count_coincidences_batch_np(
+            buckets[c1], buckets[c2], args.coinc_window_ps, delay_ps)
+        # Seconds where either channel is empty stay NaN (not counted)
+        counted = nonempty[c1] & nonempty[c2]
+        coinc[lbl][counted] = counts[counted]
+
+    # Visibility/QBER for all seconds at once; a NaN count blanks its basis
+    def vis_qber(same, opp):
+        total = same + opp
+        valid = total > 0
+        vis = np.divide(same - opp, total, out=np.full(n_sec, np.nan), where=valid)
+        qber = np.divide(opp, total, out=np.full(n_sec, np.nan), where=valid)
+        return vis, qber
+
+    vis_hv, qber_hv = vis_qber(coinc["HH"] + coinc["VV"], coinc["HV"] + coinc["VH"])
+    vis_da, qber_da = vis_qber(coinc["DD"] + coinc["AA"], coinc["DA"] + coinc["AD"])
+
+    # Counts stay integer columns unless some second was not counted
+    df = pd.DataFrame({
+        "second": seconds,
+        **{f"{lbl}_coinc": v if np.isnan(v).any() else v.astype(np.int64) for lbl, v in coinc.items()},
+        "vis_hv": vis_hv,
+        "qber_hv": qber_hv,
+        "vis_da": vis_da,
+        "qber_da": qber_da,
+        "vis_total": np.nanmean([vis_hv, vis_da], axis=0),
+        "qber_total": np.nanmean([qber_hv, qber_da], axis=0),
+    })
     df.to_csv("per_second_fixed_delay_summary.csv", index=False)
     print("Saved per_second_fixed_delay_summary.csv")
 
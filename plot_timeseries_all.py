@@ -19,11 +19,14 @@ Usage (run next to CoincFinder outputs):
   python plot_timeseries_all.py
   python plot_timeseries_all.py --data-dir /path/to/Delay_Scan_Data
   python plot_timeseries_all.py --setup4
+  python plot_timeseries_all.py --convert   # cache each folder as delay_scan.npz
+                                            # (used until a scan CSV is newer)
 """
 
 from __future__ import annotations
 
 import argparse
+import io
 from pathlib import Path
 import json
 from typing import Dict, Iterable, List, Tuple
@@ -43,6 +46,10 @@ def detector_pairs(use_setup4: bool):
     return same_pairs, cross_pairs
 
 # CSV helpers
+# Fixed column types spare the parser its per-column type inference
+SCAN_DTYPES = {"delay_ns": np.float64, "coinc": np.int32}
+
+
 def parse_second(path: Path) -> int | None:
     name = path.stem  # delay_scan_<i>_vs_<j>_second_<sec>
     if "_second_" not in name:
@@ -53,42 +60,190 @@ def parse_second(path: Path) -> int | None:
         return None
 
 
-def load_df(base: Path, i: int, j: int, sec: int):
-    f = base / f"delay_scan_{i}_vs_{j}_second_{sec}.csv"
-    if not f.exists():
+def parse_pair(path: Path) -> Tuple[int, int] | None:
+    name = path.stem  # delay_scan_<i>_vs_<j>_second_<sec>
+    try:
+        i, j = name[len("delay_scan_"):].split("_second_")[0].split("_vs_")
+        return int(i), int(j)
+    except ValueError:
         return None
-    df = pd.read_csv(f, names=["delay_ns", "coinc"])
-    return df if not df.empty else None
 
-def first_second_peak_delay(folder: Path, pair: Tuple[int, int]) -> float | None:
+
+def index_scans(folder: Path) -> Dict[Tuple[int, int], Dict[int, Path]]:
     """
-    Find the delay (ns) with max coincidences in second 0 only for a pair.
+    Map (i, j) -> {second: csv path} for every delay-scan file in a folder,
+    from a single glob.
     """
-    i, j = pair
-    f = folder / f"delay_scan_{i}_vs_{j}_second_0.csv"
-    if not f.exists():
-        return None
-    df = pd.read_csv(f, names=["delay_ns", "coinc"])
-    if df.empty:
-        return None
-    idx = df["coinc"].idxmax()
-    return float(df.loc[idx, "delay_ns"])
+    index: Dict[Tuple[int, int], Dict[int, Path]] = {}
+    for f in folder.glob("delay_scan_*_second_*.csv"):
+        pair, sec = parse_pair(f), parse_second(f)
+        if pair is not None and sec is not None:
+            index.setdefault(pair, {})[sec] = f
+    return index
+
+
+def load_pair_scans(paths: Dict[int, Path]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Read every per-second CSV of one pair and return {second: (delay_ns, coinc)}.
+    The files are joined and parsed by one pd.read_csv call, then split back
+    per second, instead of starting the parser once per tiny file. Empty
+    files are left out.
+    """
+    blobs, secs, n_rows = [], [], []
+    for sec, f in sorted(paths.items()):
+        blob = f.read_bytes()
+        rows = sum(1 for line in blob.splitlines() if line.strip())
+        if rows == 0:
+            continue
+        blobs.append(blob if blob.endswith(b"\n") else blob + b"\n")
+        secs.append(sec)
+        n_rows.append(rows)
+    if not blobs:
+        return {}
+    df = pd.read_csv(io.BytesIO(b"".join(blobs)), names=["delay_ns", "coinc"], dtype=SCAN_DTYPES)
+    bounds = np.cumsum(n_rows)[:-1]
+    delay_parts = np.split(df["delay_ns"].to_numpy(), bounds)
+    coinc_parts = np.split(df["coinc"].to_numpy(), bounds)
+    return dict(zip(secs, zip(delay_parts, coinc_parts)))
+
+
+CACHE_NAME = "delay_scan.npz"
+
+
+def convert_folder(folder: Path) -> Path:
+    """
+    Concatenate every delay_scan_*.csv of a folder into one delay_scan.npz
+    with row arrays i, j, second, delay_ns, coinc (sorted by i, j, second)
+    plus all_seconds, the seconds that had a file (empty ones included).
+    """
+    index = index_scans(folder)
+    cols: Dict[str, List[np.ndarray]] = {k: [] for k in ("i", "j", "second", "delay_ns", "coinc")}
+    for (i, j), paths in sorted(index.items()):
+        for sec, (delay_ns, coinc) in load_pair_scans(paths).items():
+            n = len(delay_ns)
+            cols["i"].append(np.full(n, i, dtype=np.int64))
+            cols["j"].append(np.full(n, j, dtype=np.int64))
+            cols["second"].append(np.full(n, sec, dtype=np.int64))
+            cols["delay_ns"].append(delay_ns)
+            cols["coinc"].append(coinc)
+    arrays = {
+        k: np.concatenate(v) if v else np.empty(0, dtype=SCAN_DTYPES.get(k, np.int64))
+        for k, v in cols.items()
+    }
+    all_seconds = np.array(sorted(set().union(*index.values())), dtype=np.int64)
+    out = folder / CACHE_NAME
+    np.savez(out, all_seconds=all_seconds, **arrays)
+    return out
+
+
+def load_cached_scans(
+    cache: Path, pairs: Dict[str, Tuple[int, int]]
+) -> Tuple[List[int], Dict[str, Dict[int, Tuple[np.ndarray, np.ndarray]]]]:
+    """
+    Read a folder's delay_scan.npz and return (seconds, {label: {second:
+    (delay_ns, coinc)}}), locating each pair's rows with searchsorted.
+    """
+    with np.load(cache) as data:
+        i, j, second = data["i"], data["j"], data["second"]
+        delay_ns, coinc = data["delay_ns"], data["coinc"]
+        seconds = data["all_seconds"].tolist()
+    pair_key = i * 65536 + j  # rows are sorted by (i, j), so this is too
+    scans: Dict[str, Dict[int, Tuple[np.ndarray, np.ndarray]]] = {}
+    for label, (pi, pj) in pairs.items():
+        key = pi * 65536 + pj
+        lo, hi = np.searchsorted(pair_key, key, "left"), np.searchsorted(pair_key, key, "right")
+        secs = second[lo:hi]
+        cuts = np.flatnonzero(np.diff(secs)) + 1
+        starts = np.concatenate(([0], cuts)) if hi > lo else cuts
+        scans[label] = dict(zip(
+            secs[starts].tolist(),
+            zip(np.split(delay_ns[lo:hi], cuts), np.split(coinc[lo:hi], cuts)),
+        ))
+    return seconds, scans
+
+
+def load_folder(
+    folder: Path, pairs: Dict[str, Tuple[int, int]]
+) -> Tuple[List[int], Dict[str, Dict[int, Tuple[np.ndarray, np.ndarray]]]]:
+    """
+    All seconds with a scan file and {label: {second: (delay_ns, coinc)}} for
+    one folder, from delay_scan.npz while it is at least as new as every
+    delay-scan CSV, otherwise from the CSVs.
+    """
+    index = index_scans(folder)
+    cache = folder / CACHE_NAME
+    if cache.exists():
+        newest_csv = max((f.stat().st_mtime for paths in index.values() for f in paths.values()), default=0.0)
+        if cache.stat().st_mtime >= newest_csv:
+            return load_cached_scans(cache, pairs)
+        print(f"{cache} is older than its delay-scan CSVs; reading the CSVs (re-run --convert to refresh it)")
+    seconds = sorted(set().union(*index.values()))
+    scans = {label: load_pair_scans(index.get(pair, {})) for label, pair in pairs.items()}
+    return seconds, scans
+
+def nearest_bin(delay_ns: np.ndarray, delay: float) -> int:
+    """
+    Index of the delay bin nearest `delay` (lower bin on ties) by binary
+    search; delay_ns must be ascending, as CoincFinder writes it.
+    """
+    k = int(np.searchsorted(delay_ns, delay))
+    if k == len(delay_ns) or (k > 0 and delay - delay_ns[k - 1] <= delay_ns[k] - delay):
+        k -= 1
+    return k
 
-def count_at_delay(folder: Path, pair: Tuple[int, int], sec: int, delay: float) -> float:
-    df = load_df(folder, pair[0], pair[1], sec)
-    if df is None or df.empty:
+
+def count_at_delay(scan: Tuple[np.ndarray, np.ndarray] | None, delay: float) -> float:
+    if scan is None:
         return 0.0
-    idx = (df["delay_ns"] - delay).abs().idxmin()
-    return float(df.loc[idx, "coinc"])
+    delay_ns, coinc = scan
+    return float(coinc[nearest_bin(delay_ns, delay)])
+
+
+def counts_at_delay(
+    scans: Dict[int, Tuple[np.ndarray, np.ndarray]], seconds: List[int], delay: float
+) -> np.ndarray:
+    """
+    Coincidences at the bin nearest `delay` for every second (0 where the scan
+    is missing). When all scans share one delay grid, as CoincFinder writes
+    them, the nearest bin is found once and read out as a single column.
+    """
+    out = np.zeros(len(seconds))
+    present = [n for n, sec in enumerate(seconds) if sec in scans]
+    if not present:
+        return out
+    grid = scans[seconds[present[0]]][0]
+    if all(np.array_equal(scans[seconds[n]][0], grid) for n in present):
+        coinc = np.stack([scans[seconds[n]][1] for n in present])
+        out[present] = coinc[:, nearest_bin(grid, delay)]
+    else:
+        for n in present:
+            out[n] = count_at_delay(scans[seconds[n]], delay)
+    return out
+
+
+def vis_qber(same: np.ndarray, opp: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-second visibility and QBER; NaN where there are no coincidences."""
+    total = same + opp
+    valid = total > 0
+    vis = np.divide(same - opp, total, out=np.full_like(total, np.nan), where=valid)
+    qber = np.divide(opp, total, out=np.full_like(total, np.nan), where=valid)
+    return vis, qber
 
 
 # Processing
-def collect_delays(first_folder: Path, same_pairs: Dict[str, Tuple[int, int]]) -> Dict[str, float]:
+def collect_delays(
+    scans: Dict[str, Dict[int, Tuple[np.ndarray, np.ndarray]]], same_pairs: Dict[str, Tuple[int, int]]
+) -> Dict[str, float]:
+    """
+    Delay (ns) with max coincidences in second 0 for each same pair, from the
+    first folder's scans.
+    """
     delays: Dict[str, float] = {}
-    for label, pair in same_pairs.items():
-        d = first_second_peak_delay(first_folder, pair)
-        if d is not None:
-            delays[label] = d
+    for label in same_pairs:
+        scan = scans.get(label, {}).get(0)
+        if scan is not None:
+            delay_ns, coinc = scan
+            delays[label] = float(delay_ns[int(np.argmax(coinc))])
     return delays
 
 
@@ -96,6 +251,9 @@ def main():
     parser = argparse.ArgumentParser(description="Plot time-series coincidences across all delay-scan folders.")
     parser.add_argument("--data-dir", type=Path, default=Path("Delay_Scan_Data"))
     parser.add_argument("--setup4", action="store_true", help="Use 4-detector setup (HV only).")
+    parser.add_argument("--convert", action="store_true",
+                        help=f"(Re)write {CACHE_NAME} in every folder from its CSVs; later runs read it "
+                             "instead while it is newer than every delay-scan CSV in that folder.")
     args = parser.parse_args()
 
     data_dir = args.data_dir
@@ -103,10 +261,16 @@ def main():
     if not folders:
         raise SystemExit(f"No folders found in {data_dir}")
 
+    if args.convert:
+        for folder in folders:
+            print(f"Wrote {convert_folder(folder)}")
+
     same_pairs, cross_pairs = detector_pairs(args.setup4)
+    all_pairs = {**same_pairs, **cross_pairs}
 
     # Determine delays from first folder only
-    delays = collect_delays(folders[0], same_pairs)
+    loaded = {folders[0]: load_folder(folders[0], all_pairs)}
+    delays = collect_delays(loaded[folders[0]][1], same_pairs)
     if not delays:
         raise SystemExit("Could not determine peak delays in the first folder.")
 
@@ -118,58 +282,38 @@ def main():
 
     t = 0
     for folder in folders:
-        seconds = sorted({parse_second(f) for f in folder.glob("delay_scan_*_second_*.csv") if parse_second(f) is not None})
+        # Every scan needed from this folder, parsed once per pair
+        seconds, scans = loaded.pop(folder) if folder in loaded else load_folder(folder, all_pairs)
         if len(seconds) <= 1:
             continue
         seconds = seconds[:-1]  # drop last second (potentially incomplete)
 
-        for sec in seconds:
-            # same counts
-            same_vals = {}
-            for label, pair in same_pairs.items():
-                delay = delays.get(label)
-                same_vals[label] = count_at_delay(folder, pair, sec, delay) if delay is not None else 0.0
-                counts[label].append(same_vals[label])
-
-            # cross counts
-            cross_map = {
-                "HV": ("HH", cross_pairs.get("HV")),
-                "VH": ("VV", cross_pairs.get("VH")),
-            }
-            if not args.setup4:
-                cross_map.update({
-                    "DA": ("DD", cross_pairs.get("DA")),
-                    "AD": ("AA", cross_pairs.get("AD")),
-                })
-
-            for clabel, (same_label, pair) in cross_map.items():
-                if pair is None:
-                    counts[clabel].append(0.0)
-                    continue
-                delay = delays.get(same_label)
-                val = count_at_delay(folder, pair, sec, delay) if delay is not None else 0.0
-                counts[clabel].append(val)
-
-            # visibility/QBER per second
-            hv_same = same_vals.get("HH", 0.0) + same_vals.get("VV", 0.0)
-            hv_opp = counts["HV"][-1] + counts["VH"][-1]
-            vis_hv = (hv_same - hv_opp) / (hv_same + hv_opp) if (hv_same + hv_opp) > 0 else np.nan
-            q_hv = hv_opp / (hv_same + hv_opp) if (hv_same + hv_opp) > 0 else np.nan
-
-            if args.setup4:
-                vis_total.append(vis_hv)
-                qber_total.append(q_hv)
-            else:
-                da_same = same_vals.get("DD", 0.0) + same_vals.get("AA", 0.0)
-                da_opp = counts["DA"][-1] + counts["AD"][-1]
-                vis_da = (da_same - da_opp) / (da_same + da_opp) if (da_same + da_opp) > 0 else np.nan
-                q_da = da_opp / (da_same + da_opp) if (da_same + da_opp) > 0 else np.nan
-
-                vis_total.append(np.nanmean([vis_hv, vis_da]))
-                qber_total.append(np.nanmean([q_hv, q_da]))
-
-            time_axis.append(t)
-            t += 1
+        # same counts, then cross counts at the delay of their same pair
+        cross_map = {"HV": "HH", "VH": "VV"}
+        if not args.setup4:
+            cross_map.update({"DA": "DD", "AD": "AA"})
+        folder_counts: Dict[str, np.ndarray] = {}
+        for label in same_pairs:
+            delay = delays.get(label)
+            folder_counts[label] = counts_at_delay(scans[label], seconds, delay) if delay is not None else np.zeros(len(seconds))
+        for clabel, same_label in cross_map.items():
+            delay = delays.get(same_label)
+            folder_counts[clabel] = counts_at_delay(scans[clabel], seconds, delay) if delay is not None else np.zeros(len(seconds))
+        for label, series in folder_counts.items():
+            counts[label].extend(series.tolist())
+
+        # visibility/QBER per second
+        vis_hv, q_hv = vis_qber(folder_counts["HH"] + folder_counts["VV"], folder_counts["HV"] + folder_counts["VH"])
+        if args.setup4:
+            vis_total.extend(vis_hv.tolist())
+            qber_total.extend(q_hv.tolist())
+        else:
+            vis_da, q_da = vis_qber(folder_counts["DD"] + folder_counts["AA"], folder_counts["DA"] + folder_counts["AD"])
+            vis_total.extend(np.nanmean([vis_hv, vis_da], axis=0).tolist())
+            qber_total.extend(np.nanmean([q_hv, q_da], axis=0).tolist())
+
+        time_axis.extend(range(t, t + len(seconds)))
+        t += len(seconds)
 
     # Save processed time-series so it doesn't need recomputation.
     save_path = data_dir / "timeseries.csv"
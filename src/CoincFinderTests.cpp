@@ -2,6 +2,8 @@
 #include <cassert>
 #include <cmath>
 #include <iostream>
+#include <stdexcept>
+#include <tuple>
 #include <vector>
 
 #include "Coincidences.h"
@@ -70,6 +72,75 @@ void testFindBestDelay() {
     assert(best == offset);
 }
 
+void testBatchMatchesSingleCounts() {
+    std::vector<std::vector<Timestamp>> firsts, seconds;
+    for (Timestamp sec = 0; sec < 5; ++sec) {
+        std::vector<Timestamp> a, b;
+        for (Timestamp i = 0; i < 20 + sec * 7; ++i) {
+            a.push_back(sec * 1'000'000 + i * 3'000);
+            if (i % (sec + 2) != 0)
+                b.push_back(sec * 1'000'000 + i * 3'000 - 900 + (i % 5) * 40);
+        }
+        firsts.push_back(std::move(a));
+        seconds.push_back(std::move(b));
+    }
+    firsts.emplace_back(); // an empty bucket counts as zero
+    seconds.push_back({1, 2, 3});
+
+    std::vector<std::span<const Timestamp>> spans1, spans2;
+    for (size_t k = 0; k < firsts.size(); ++k) {
+        spans1.emplace_back(firsts[k].data(), firsts[k].size());
+        spans2.emplace_back(seconds[k].data(), seconds[k].size());
+    }
+
+    const std::vector<int> counts = countCoincidencesBatch(spans1, spans2, 100, 900);
+    assert(counts.size() == firsts.size());
+    for (size_t k = 0; k < firsts.size(); ++k)
+        assert(counts[k] == naiveCoincidences(firsts[k], seconds[k], 100, 900));
+    assert(counts.back() == 0);
+
+    bool threw = false;
+    spans2.pop_back();
+    try {
+        countCoincidencesBatch(spans1, spans2, 100, 900);
+    } catch (const std::invalid_argument &) {
+        threw = true;
+    }
+    assert(threw);
+}
+
+void testPairsMatchSingleCounts() {
+    std::vector<std::vector<Timestamp>> traces(3);
+    for (Timestamp i = 0; i < 40; ++i) {
+        traces[0].push_back(i * 5'000);
+        if (i % 3 != 0)
+            traces[1].push_back(i * 5'000 + 900 + (i % 4) * 30);
+        if (i % 2 == 0)
+            traces[2].push_back(i * 5'000 - 400);
+    }
+    std::vector<std::span<const Timestamp>> spans;
+    for (const auto &t : traces)
+        spans.emplace_back(t.data(), t.size());
+
+    const std::vector<std::tuple<size_t, size_t, Timestamp>> pairs{
+        {0, 1, -900}, {0, 2, 400}, {1, 2, 1'300}, {2, 0, -400}};
+    const std::vector<int> counts = countCoincidencesForPairs(spans, pairs, 100);
+    assert(counts.size() == pairs.size());
+    for (size_t k = 0; k < pairs.size(); ++k) {
+        const auto &[i, j, delay] = pairs[k];
+        assert(counts[k] == naiveCoincidences(traces[i], traces[j], 100, delay));
+    }
+    assert(counts[0] > 0 && counts[1] > 0);
+
+    bool threw = false;
+    try {
+        countCoincidencesForPairs(spans, {{0, 3, 0}}, 100);
+    } catch (const std::out_of_range &) {
+        threw = true;
+    }
+    assert(threw);
+}
+
 void testNFoldCounts() {
     std::vector<Timestamp> base;
     for (size_t i = 0; i < 10; ++i)
@@ -98,6 +169,8 @@ void testNFoldCounts() {
 int main() {
     testHistogramMatchesNaive();
     testFindBestDelay();
+    testBatchMatchesSingleCounts();
+    testPairsMatchSingleCounts();
     testNFoldCounts();
     std::cout << "All CoincFinder tests passed" << std::endl;
     return 0;
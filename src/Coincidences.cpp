@@ -108,6 +108,45 @@ int countCoincidencesWithDelay(std::span<const long long> ch1,
                                              nullptr);
 }
 
+std::vector<int> countCoincidencesBatch(
+    const std::vector<std::span<const long long>> &ch1,
+    const std::vector<std::span<const long long>> &ch2,
+    long long coincWindowPs, long long delayPs) {
+    if (ch1.size() != ch2.size())
+        throw std::invalid_argument("ch1 and ch2 batches must have the same size");
+
+    // Each entry is an independent two-pointer sweep writing only its own
+    // slot, so the loop parallelizes without synchronization. Dynamic
+    // scheduling evens out seconds with very different event counts.
+    std::vector<int> counts(ch1.size(), 0);
+#pragma omp parallel for schedule(dynamic)
+    for (int k = 0; k < static_cast<int>(ch1.size()); ++k) {
+        const size_t idx = static_cast<size_t>(k);
+        counts[idx] = countCoincidencesWithDelay<false>(
+            ch1[idx], ch2[idx], coincWindowPs, delayPs, nullptr);
+    }
+    return counts;
+}
+
+std::vector<int> countCoincidencesForPairs(
+    const std::vector<std::span<const long long>> &channels,
+    const std::vector<std::tuple<size_t, size_t, long long>> &pairs,
+    long long coincWindowPs) {
+    for (const auto &pair : pairs) {
+        if (std::get<0>(pair) >= channels.size() || std::get<1>(pair) >= channels.size())
+            throw std::out_of_range("Pair channel index out of range");
+    }
+
+    std::vector<int> counts(pairs.size(), 0);
+#pragma omp parallel for schedule(dynamic)
+    for (int k = 0; k < static_cast<int>(pairs.size()); ++k) {
+        const auto &[i, j, delayPs] = pairs[static_cast<size_t>(k)];
+        counts[static_cast<size_t>(k)] = countCoincidencesWithDelay<false>(
+            channels[i], channels[j], coincWindowPs, delayPs, nullptr);
+    }
+    return counts;
+}
+
 int countNFoldCoincidences(const std::vector<std::span<const long long>> &channels,
                            long long coincWindowPs,
                            std::span<const long long> offsetsPs) {
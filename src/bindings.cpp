@@ -1,8 +1,13 @@
+#include <algorithm>
 #include <cmath>
+#include <map>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 #include <pybind11/numpy.h>
 #include <span>
+#include <stdexcept>
+#include <string>
+#include <tuple>
 
 #include "Coincidences.h"
 #include "ReadCSV.h"
@@ -109,6 +114,95 @@ PYBIND11_MODULE(coincfinder, m) {
       py::arg("delay_ps"),
       "Count coincidences (picoseconds) accepting NumPy arrays without copying when C-contiguous.");
 
+  m.def(
+      "count_coincidences_batch_np",
+      [](py::list ch1_list, py::list ch2_list, double coinc_window_ps,
+         double delay_ps) {
+        if (py::len(ch1_list) != py::len(ch2_list))
+          throw std::invalid_argument("ch1_list and ch2_list must have the same length");
+        // Keep the converted arrays alive while the spans point into them.
+        std::vector<py::array_t<long long, py::array::c_style | py::array::forcecast>> arrays;
+        arrays.reserve(2 * py::len(ch1_list));
+        auto to_spans = [&arrays](py::list items) {
+          std::vector<std::span<const long long>> spans;
+          spans.reserve(py::len(items));
+          for (auto item : items) {
+            arrays.emplace_back(py::cast<py::array>(item));
+            auto b = arrays.back().unchecked<1>();
+            spans.emplace_back(b.data(0), b.size());
+          }
+          return spans;
+        };
+        const auto spans1 = to_spans(ch1_list);
+        const auto spans2 = to_spans(ch2_list);
+
+        std::vector<int> counts;
+        {
+          py::gil_scoped_release release;
+          counts = countCoincidencesBatch(
+              spans1, spans2,
+              static_cast<long long>(std::llround(coinc_window_ps)),
+              static_cast<long long>(std::llround(delay_ps)));
+        }
+        py::array_t<long long> out(static_cast<py::ssize_t>(counts.size()));
+        std::copy(counts.begin(), counts.end(), out.mutable_data());
+        return out;
+      },
+      py::arg("ch1_list"), py::arg("ch2_list"), py::arg("coinc_window_ps"),
+      py::arg("delay_ps"),
+      "Count coincidences (picoseconds) for many bucket pairs at one delay, "
+      "e.g. one pair per second; returns an int64 array. Runs without the GIL "
+      "and in parallel when OpenMP is available.");
+
+  m.def(
+      "count_coincidences_pairs_np",
+      [](py::dict channels, py::list pairs, double coinc_window_ps) {
+        // Channel ids -> positions in one span list; arrays stay alive in
+        // `arrays` while the spans point into them.
+        std::vector<py::array_t<long long, py::array::c_style | py::array::forcecast>> arrays;
+        std::vector<std::span<const long long>> spans;
+        std::map<long long, size_t> position;
+        arrays.reserve(py::len(channels));
+        for (auto item : channels) {
+          arrays.emplace_back(py::cast<py::array>(item.second));
+          auto b = arrays.back().unchecked<1>();
+          spans.emplace_back(b.data(0), b.size());
+          position[py::cast<long long>(item.first)] = spans.size() - 1;
+        }
+        auto index_of = [&position](long long ch) {
+          auto it = position.find(ch);
+          if (it == position.end())
+            throw std::invalid_argument("pair uses channel " + std::to_string(ch) +
+                                        " missing from channels");
+          return it->second;
+        };
+        std::vector<std::tuple<size_t, size_t, long long>> triples;
+        triples.reserve(py::len(pairs));
+        for (auto item : pairs) {
+          auto t = py::cast<py::tuple>(item);
+          if (t.size() != 3)
+            throw std::invalid_argument("pairs must be (ch1, ch2, delay_ps) tuples");
+          triples.emplace_back(index_of(py::cast<long long>(t[0])),
+                               index_of(py::cast<long long>(t[1])),
+                               static_cast<long long>(std::llround(py::cast<double>(t[2]))));
+        }
+
+        std::vector<int> counts;
+        {
+          py::gil_scoped_release release;
+          counts = countCoincidencesForPairs(
+              spans, triples, static_cast<long long>(std::llround(coinc_window_ps)));
+        }
+        py::array_t<long long> out(static_cast<py::ssize_t>(counts.size()));
+        std::copy(counts.begin(), counts.end(), out.mutable_data());
+        return out;
+      },
+      py::arg("channels"), py::arg("pairs"), py::arg("coinc_window_ps"),
+      "Count coincidences (picoseconds) for several pairs in one call. channels "
+      "maps channel id -> int64 array; pairs is a list of (ch1, ch2, delay_ps). "
+      "Returns an int64 array, one count per pair; runs without the GIL and in "
+      "parallel when OpenMP is available.");
+
   m.def(
       "collect_coincidences_with_delay_ps",
       [](const std::vector<long long> &ch1, const std::vector<long long> &ch2,
@@ -149,6 +243,27 @@ PYBIND11_MODULE(coincfinder, m) {
       "If collect=False (default), return coincidence count; if True, return "
       "list of timestamp pairs (picoseconds) at the given delay/window.");
 
+  m.def(
+      "coincidences_with_delay_np",
+      [](py::array_t<long long, py::array::c_style | py::array::forcecast> ch1,
+         py::array_t<long long, py::array::c_style | py::array::forcecast> ch2,
+         double coinc_window_ps, double delay_ps, bool collect) -> py::object {
+        const auto coinc_window_ll =
+            static_cast<long long>(std::llround(coinc_window_ps));
+        const auto delay_ll = static_cast<long long>(std::llround(delay_ps));
+        auto b1 = ch1.unchecked<1>();
+        auto b2 = ch2.unchecked<1>();
+        std::span<const long long> s1(b1.data(0), b1.size());
+        std::span<const long long> s2(b2.data(0), b2.size());
+        if (collect)
+          return py::cast(collectCoincidencesWithDelay(s1, s2, coinc_window_ll, delay_ll));
+        return py::cast(countCoincidencesWithDelay(s1, s2, coinc_window_ll, delay_ll));
+      },
+      py::arg("ch1"), py::arg("ch2"), py::arg("coinc_window_ps"),
+      py::arg("delay_ps"), py::arg("collect") = false,
+      "coincidences_with_delay_ps accepting NumPy arrays without copying when "
+      "C-contiguous.");
+
   // --- Compute coincidences for range (accept delays in ps)
   m.def(
       "compute_coincidences_for_range_ps",
@@ -9,23 +9,26 @@ Summarize CoincFinder delay-scan folders:
     * HV & DA QBER together
     * Total visibility & total QBER on twin axes
     * Total coincidences per folder
-- Saves summary table to summary.csv
+- Saves summary table to summary.csv and the plots to summary.png
 Usage examples (run next to CoincFinder.exe or from project root):
   python summarize_delay_folders.py
   python summarize_delay_folders.py --data-dir C:/path/to/Delay_Scan_Data
   python summarize_delay_folders.py --setup4
+  python summarize_delay_folders.py --no-show   # headless: write summary.png only
 """
 
 from __future__ import annotations
 
 import argparse
+from collections import defaultdict
 from pathlib import Path
 import os
+import sys
 import concurrent.futures
 import itertools
 import threading
 import time
-from typing import Iterable, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -56,105 +59,214 @@ def detector_setup(use_setup4: bool):
 
 
 # Helpers reading per-second CSVs
-def parse_second_from_name(path: Path) -> int | None:
-    name = path.stem  # delay_scan_<i>_vs_<j>_second_<sec>
-    if "_second_" not in name:
+ScanCache = Dict[Tuple[int, int, int], np.ndarray]
+
+
+def index_folder(folder: Path) -> Tuple[List[int], Dict[Tuple[int, int, int], str]]:
+    """
+    One os.scandir pass over a folder: every second that has a scan file, and
+    {(i, j, second): path} for the files named delay_scan_<i>_vs_<j>_second_<sec>.csv.
+    """
+    seconds = set()
+    index: Dict[Tuple[int, int, int], str] = {}
+    with os.scandir(folder) as it:
+        for e in it:
+            name = e.name
+            if not (name.startswith("delay_scan_") and name.endswith(".csv")) or "_second_" not in name:
+                continue
+            head, _, sec = name[len("delay_scan_"):-len(".csv")].rpartition("_second_")
+            try:
+                sec = int(sec)
+            except ValueError:
+                continue
+            seconds.add(sec)
+            i, _, j = head.partition("_vs_")
+            try:
+                index[(int(i), int(j), sec)] = e.path
+            except ValueError:
+                continue
+    return sorted(seconds), index
+
+
+def read_scan(path: str) -> np.ndarray | None:
+    """
+    Return one delay-scan CSV as an (n, 2) float64 array of [delay_ns, coinc]
+    rows, or None if the file is empty. np.loadtxt skips the DataFrame build and type
+    inference that dominate pd.read_csv on files this small.
+    """
+    if os.path.getsize(path) == 0:
         return None
-    try:
-        return int(name.split("_second_")[1])
-    except ValueError:
+    scan = np.loadtxt(path, delimiter=",", ndmin=2, dtype=np.float64)
+    if len(scan) == 0:
         return None
+    return scan
 
 
-def get_peak_delay_and_count(base: Path, i: int, j: int, sec: int):
-    f = base / f"delay_scan_{i}_vs_{j}_second_{sec}.csv"
-    if not f.exists():
-        return None, 0.0
-    df = pd.read_csv(f, names=["delay_ns", "coinc"])
-    if df.empty:
-        return None, 0.0
-    idx_max = df["coinc"].idxmax()
-    return float(df.loc[idx_max, "delay_ns"]), float(df.loc[idx_max, "coinc"])
+def load_scans(index: Dict[Tuple[int, int, int], str], pairs: Iterable[Tuple[int, int]]) -> ScanCache:
+    """
+    Parse every scan file of the given pairs once, keyed by (i, j, second).
+    Missing and empty files have no entry.
+    """
+    wanted = set(pairs)
+    keyed = {key: path for key, path in index.items() if key[:2] in wanted}
+    if not keyed:
+        return {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(keyed))) as ex:
+        scans = dict(zip(keyed, ex.map(read_scan, keyed.values())))
+    return {key: scan for key, scan in scans.items() if scan is not None}
 
 
-def get_count_at_delay(base: Path, i: int, j: int, sec: int, delay_target: float):
-    f = base / f"delay_scan_{i}_vs_{j}_second_{sec}.csv"
-    if not f.exists():
-        return 0.0
-    df = pd.read_csv(f, names=["delay_ns", "coinc"])
-    if df.empty:
+def get_peak_delay_and_count(arr: np.ndarray | None):
+    if arr is None:
+        return None, 0.0
+    idx_max = int(arr[:, 1].argmax())
+    return float(arr[idx_max, 0]), float(arr[idx_max, 1])
+
+
+def nearest_bin(delay: np.ndarray, target: float) -> int:
+    """
+    Index of the delay nearest target (first one on ties). On an ascending
+    axis the index is estimated arithmetically from the axis ends, exact for
+    CoincFinder's uniform grids, then stepped to the true minimum;
+    |delay - target| is V-shaped on a sorted axis, so the walk is O(1) there.
+    Any other axis gets a full search.
+    """
+    n = len(delay)
+    if n == 1:
+        return 0
+    if np.any(np.diff(delay) < 0):
+        return int(np.abs(delay - target).argmin())
+    d0, d1 = float(delay[0]), float(delay[-1])
+    k = int(round((target - d0) / (d1 - d0) * (n - 1))) if d1 != d0 else 0
+    k = min(max(k, 0), n - 1)
+    while k < n - 1 and abs(delay[k + 1] - target) <= abs(delay[k] - target):
+        k += 1
+    while k > 0 and abs(delay[k - 1] - target) <= abs(delay[k] - target):
+        k -= 1
+    return k
+
+
+def get_count_at_delay(arr: np.ndarray | None, delay_target: float):
+    if arr is None:
         return 0.0
-    idx = (df["delay_ns"] - delay_target).abs().idxmin()
-    return float(df.loc[idx, "coinc"])
+    return float(arr[nearest_bin(arr[:, 0], delay_target), 1])
 
 
-def counts_same_opp(base: Path, sec: int, same_pairs: Iterable[Tuple[int, int]], opp_pairs: Iterable[Tuple[int, int]]):
+def counts_same_opp(cache: ScanCache, sec: int, same_pairs: Iterable[Tuple[int, int]], opp_pairs: Iterable[Tuple[int, int]]):
     C_same_total, C_opp_total = 0.0, 0.0
     for (si, sj), (oi, oj) in zip(same_pairs, opp_pairs):
-        delay_peak, C_same = get_peak_delay_and_count(base, si, sj, sec)
+        delay_peak, C_same = get_peak_delay_and_count(cache.get((si, sj, sec)))
         if delay_peak is None:
             continue
-        C_opp = get_count_at_delay(base, oi, oj, sec, delay_peak)
+        C_opp = get_count_at_delay(cache.get((oi, oj, sec)), delay_peak)
         C_same_total += C_same
         C_opp_total += C_opp
     return C_same_total, C_opp_total
 
 
-def compute_metrics(base: Path, seconds: Iterable[int], same_pairs, opp_pairs):
-    vis, qber, same_counts, opp_counts = [], [], [], []
-    for sec in seconds:
-        C_same, C_opp = counts_same_opp(base, sec, same_pairs, opp_pairs)
-        same_counts.append(C_same)
-        opp_counts.append(C_opp)
-        total = C_same + C_opp
-        if total == 0:
-            vis.append(np.nan)
-            qber.append(np.nan)
-        else:
-            vis.append((C_same - C_opp) / total)
-            qber.append(C_opp / total)
-    same_arr = np.array(same_counts, dtype=float)
-    opp_arr = np.array(opp_counts, dtype=float)
+def shared_delay_grid(cache: ScanCache, seconds: List[int], pairs: Iterable[Tuple[int, int]]) -> np.ndarray | None:
+    """
+    The delay axis shared by every cached scan of these pairs and seconds, or
+    None if the scans differ (or the axis is not strictly increasing).
+    """
+    scans = [cache[key] for key in ((i, j, sec) for i, j in pairs for sec in seconds) if key in cache]
+    if not scans:
+        return None
+    grid = scans[0][:, 0]
+    if np.any(np.diff(grid) <= 0) or not all(np.array_equal(scan[:, 0], grid) for scan in scans):
+        return None
+    return grid
+
+
+def stack_counts(cache: ScanCache, pair: Tuple[int, int], seconds: List[int], n_bins: int):
+    """(n_seconds, n_bins) coincidence matrix of one pair plus a row-present mask."""
+    counts = np.zeros((len(seconds), n_bins))
+    present = np.zeros(len(seconds), dtype=bool)
+    for row, sec in enumerate(seconds):
+        scan = cache.get((*pair, sec))
+        if scan is not None:
+            counts[row] = scan[:, 1]
+            present[row] = True
+    return counts, present
+
+
+def compute_metrics(cache: ScanCache, seconds: List[int], same_pairs, opp_pairs):
+    n = len(seconds)
+    grid = shared_delay_grid(cache, seconds, list(same_pairs) + list(opp_pairs))
+    if grid is None:
+        same_arr = np.empty(n)
+        opp_arr = np.empty(n)
+        for idx, sec in enumerate(seconds):
+            same_arr[idx], opp_arr[idx] = counts_same_opp(cache, sec, same_pairs, opp_pairs)
+    else:
+        # One delay axis for all scans: the peak bin of every second comes from
+        # a single argmax, and on the same axis the opposite pair's nearest bin
+        # is the peak bin itself.
+        same_arr = np.zeros(n)
+        opp_arr = np.zeros(n)
+        rows = np.arange(n)
+        for same_pair, opp_pair in zip(same_pairs, opp_pairs):
+            same, has_same = stack_counts(cache, same_pair, seconds, len(grid))
+            opp, has_opp = stack_counts(cache, opp_pair, seconds, len(grid))
+            peak = same.argmax(axis=1)
+            same_arr += np.where(has_same, same[rows, peak], 0.0)
+            opp_arr += np.where(has_same & has_opp, opp[rows, peak], 0.0)
+    total = same_arr + opp_arr
+    # Seconds without coincidences stay NaN
+    valid = total != 0
+    vis = np.divide(same_arr - opp_arr, total, out=np.full(n, np.nan), where=valid)
+    qber = np.divide(opp_arr, total, out=np.full(n, np.nan), where=valid)
     return (
-        np.array(vis, dtype=float),
-        np.array(qber, dtype=float),
+        vis,
+        qber,
         same_arr,
         opp_arr,
         float(np.nansum(same_arr) + np.nansum(opp_arr)),
     )
 
+def mean_std(a: np.ndarray) -> Tuple[float, float]:
+    """NaN-ignoring mean and (population) std, reusing the mean for the std."""
+    m = np.nanmean(a)
+    return m, np.sqrt(np.nanmean((a - m) ** 2))
+
+
 # Main aggregation
 def summarize_folder(folder: Path, use_setup4: bool):
     pairs, same_HV, opp_HV, same_DA, opp_DA = detector_setup(use_setup4)
 
-    files = list(folder.glob("delay_scan_*_second_*.csv"))
-    seconds = sorted({parse_second_from_name(f) for f in files if parse_second_from_name(f) is not None})
+    seconds, index = index_folder(folder)
     if not seconds:
         return None  # no data
+    # Each needed scan file is parsed exactly once
+    cache = load_scans(index, same_HV + opp_HV + same_DA + opp_DA)
 
-    vis_HV, q_HV, same_HV_counts, opp_HV_counts, total_HV = compute_metrics(folder, seconds, same_HV, opp_HV)
+    vis_HV, q_HV, same_HV_counts, opp_HV_counts, total_HV = compute_metrics(cache, seconds, same_HV, opp_HV)
 
     vis_DA = q_DA = same_DA_counts = opp_DA_counts = np.array([])
     if not use_setup4:
-        vis_DA, q_DA, same_DA_counts, opp_DA_counts, total_DA = compute_metrics(folder, seconds, same_DA, opp_DA)
+        vis_DA, q_DA, same_DA_counts, opp_DA_counts, total_DA = compute_metrics(cache, seconds, same_DA, opp_DA)
 
+    HV_vis_mean, HV_vis_std = mean_std(vis_HV)
+    HV_qber_mean, HV_qber_std = mean_std(q_HV)
     summary = {
         "folder": folder.name,
         "n_seconds": len(seconds),
-        "HV_vis_mean": np.nanmean(vis_HV),
-        "HV_vis_std": np.nanstd(vis_HV),
-        "HV_qber_mean": np.nanmean(q_HV),
-        "HV_qber_std": np.nanstd(q_HV),
+        "HV_vis_mean": HV_vis_mean,
+        "HV_vis_std": HV_vis_std,
+        "HV_qber_mean": HV_qber_mean,
+        "HV_qber_std": HV_qber_std,
         "HV_same_mean": np.nanmean(same_HV_counts),
         "HV_opp_mean": np.nanmean(opp_HV_counts),
         "HV_coinc_total": float(total_HV),
     }
     if not use_setup4:
+        DA_vis_mean, DA_vis_std = mean_std(vis_DA)
+        DA_qber_mean, DA_qber_std = mean_std(q_DA)
         summary.update({
-            "DA_vis_mean": np.nanmean(vis_DA),
-            "DA_vis_std": np.nanstd(vis_DA),
-            "DA_qber_mean": np.nanmean(q_DA),
-            "DA_qber_std": np.nanstd(q_DA),
+            "DA_vis_mean": DA_vis_mean,
+            "DA_vis_std": DA_vis_std,
+            "DA_qber_mean": DA_qber_mean,
+            "DA_qber_std": DA_qber_std,
             "DA_same_mean": np.nanmean(same_DA_counts),
             "DA_opp_mean": np.nanmean(opp_DA_counts),
             "DA_coinc_total": float(total_DA),
@@ -184,13 +296,43 @@ def summarize_folder(folder: Path, use_setup4: bool):
     return summary
 
 
+def decimate(x, y, target: int = 500) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-bucket min and max of y, each kept at its own x and in its original
+    order, giving about `target` points for longer series (shorter ones pass
+    through). NaN is ignored unless a whole bucket is NaN.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(y) <= target:
+        return x, y
+    starts = np.linspace(0, len(y), target // 2, endpoint=False).astype(int)
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(y))))
+    idx = np.arange(len(y))
+    # First index in each bucket where y hits the bucket's min/max; an all-NaN
+    # bucket matches nothing and falls back to its first point.
+    extreme = []
+    for reduce in (np.fmin, np.fmax):
+        hit = y == reduce.reduceat(y, starts)[bucket]
+        first = np.minimum.reduceat(np.where(hit, idx, len(y)), starts)
+        extreme.append(np.where(first < len(y), first, starts))
+    order = np.sort(np.stack(extreme, axis=1), axis=1).ravel()
+    return x[order], y[order]
+
+
+def set_folder_ticks(ax, x: List[int], labels: List[str], max_ticks: int = 50):
+    """Label at most `max_ticks` folders, taking every k-th one for longer runs."""
+    step = max(1, -(-len(x) // max_ticks))
+    ax.set_xticks(x[::step])
+    ax.set_xticklabels(labels[::step], rotation=45, ha="right")
+
+
 def plot_series(ax, x: List[int], labels: List[str], values: List[float], title: str, ylabel: str, to_percent=False):
     vals = [v * 100 if to_percent else v for v in values]
-    ax.plot(x, vals, marker="o", linestyle="-", color="tab:blue")
+    ax.plot(*decimate(x, vals), marker="o", linestyle="-", color="tab:blue")
     ax.set_title(title)
     ax.set_ylabel(ylabel)
-    ax.set_xticks(x)
-    ax.set_xticklabels(labels, rotation=45, ha="right")
+    set_folder_ticks(ax, x, labels)
     ax.grid(True, alpha=0.3)
 
 
@@ -199,6 +341,8 @@ def main():
     parser.add_argument("--data-dir", type=Path, default=Path("Delay_Scan_Data"), help="Path to Delay_Scan_Data root")
     parser.add_argument("--setup4", action="store_true", help="Use 4-detector setup instead of 8-detector")
     parser.add_argument("--no-plots", action="store_true", help="Skip plotting, just print table")
+    parser.add_argument("--no-show", action="store_true",
+                        help="Only save summary.png (Agg backend, no GUI; for headless runs)")
     parser.add_argument("--jobs", type=int, default=0, help="Parallel workers (0 = auto)")
     args = parser.parse_args()
 
@@ -209,8 +353,9 @@ def main():
     if not folders:
         raise SystemExit("No folders found in data directory.")
 
-    # Parallelize per-folder summaries (I/O bound; threads are fine).
-    workers = None if args.jobs <= 0 else args.jobs
+    # Parallelize per-folder summaries on processes: parsing and the NumPy
+    # reductions hold the GIL for much of their time, so threads don't scale.
+    workers = (os.cpu_count() or 1) if args.jobs <= 0 else args.jobs
     stop_spinner = threading.Event()
 
     def spinner():
@@ -222,22 +367,32 @@ def main():
         # clear line
         print("\r" + " " * 40 + "\r", end="", flush=True)
 
-    spinner_thread = threading.Thread(target=spinner, daemon=True)
-    spinner_thread.start()
+    # Only animate on a terminal; in logs the escape codes are just noise.
+    spinner_thread = threading.Thread(target=spinner, daemon=True) if sys.stdout.isatty() else None
+    if spinner_thread is not None:
+        spinner_thread.start()
 
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
-            results = list(ex.map(lambda f: summarize_folder(f, args.setup4), folders))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(summarize_folder, folders, itertools.repeat(args.setup4),
+                                  chunksize=max(1, len(folders) // (4 * workers))))
     finally:
         stop_spinner.set()
-        spinner_thread.join()
-
-    summaries = [s for s in results if s]
-
-    if not summaries:
+        if spinner_thread is not None:
+            spinner_thread.join()
+
+    # Column-major: one list per field, so each column is built from a flat
+    # array rather than inferred cell by cell from a list of dicts.
+    cols: Dict[str, list] = defaultdict(list)
+    for summary in results:
+        if summary:
+            for key, value in summary.items():
+                cols[key].append(value)
+
+    if not cols:
         raise SystemExit("No delay scan data found.")
 
-    df = pd.DataFrame(summaries)
+    df = pd.DataFrame({key: np.asarray(values) for key, values in cols.items()})
 
     # Save summary CSV (comma-separated) into the data directory
     out_csv = args.data_dir / "summary.csv"
@@ -248,6 +403,8 @@ def main():
 
     if args.no_plots:
         return
+    if args.no_show:
+        plt.switch_backend("Agg")
 
     labels = df["folder"].tolist()
     x = list(range(len(labels)))
@@ -260,23 +417,22 @@ def main():
     else:
         fig, axes = plt.subplots(1, 4, figsize=(22, 5))
         plot_series(axes[0], x, labels, df["HV_vis_mean"].tolist(), "HV vs DA Visibility", "Visibility (%)", to_percent=True)
-        axes[0].plot(x, np.array(df["DA_vis_mean"], float) * 100, marker="s", linestyle="--", color="tab:orange", label="DA visibility")
+        axes[0].plot(*decimate(x, np.array(df["DA_vis_mean"], float) * 100), marker="s", linestyle="--", color="tab:orange", label="DA visibility")
         axes[0].legend()
 
         plot_series(axes[1], x, labels, df["HV_qber_mean"].tolist(), "HV vs DA QBER", "QBER (%)", to_percent=True)
-        axes[1].plot(x, np.array(df["DA_qber_mean"], float) * 100, marker="s", linestyle="--", color="tab:orange", label="DA QBER")
+        axes[1].plot(*decimate(x, np.array(df["DA_qber_mean"], float) * 100), marker="s", linestyle="--", color="tab:orange", label="DA QBER")
         axes[1].legend()
 
         # Total visibility & QBER on twin axes
         ax_tot = axes[2]
-        ax_tot.plot(x, np.array(df["Total_vis_mean"], float) * 100, marker="o", linestyle="-", color="tab:blue", label="Total visibility")
+        ax_tot.plot(*decimate(x, np.array(df["Total_vis_mean"], float) * 100), marker="o", linestyle="-", color="tab:blue", label="Total visibility")
         ax_tot.set_ylabel("Total visibility (%)", color="tab:blue")
         ax_tot.tick_params(axis="y", labelcolor="tab:blue")
-        ax_tot.set_xticks(x)
-        ax_tot.set_xticklabels(labels, rotation=45, ha="right")
+        set_folder_ticks(ax_tot, x, labels)
         ax_tot.grid(True, alpha=0.3)
         ax_tot_twin = ax_tot.twinx()
-        ax_tot_twin.plot(x, np.array(df["Total_qber_mean"], float) * 100, marker="s", linestyle="--", color="tab:red", label="Total QBER")
+        ax_tot_twin.plot(*decimate(x, np.array(df["Total_qber_mean"], float) * 100), marker="s", linestyle="--", color="tab:red", label="Total QBER")
         ax_tot_twin.set_ylabel("Total QBER (%)", color="tab:red")
         ax_tot_twin.tick_params(axis="y", labelcolor="tab:red")
         ax_tot.set_title("Total visibility & QBER")
@@ -288,8 +444,14 @@ def main():
         # Total coincidences
         plot_series(axes[3], x, labels, df["Total_coinc_total"].tolist(), "Total coincidences", "Counts")
 
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    out_png = args.data_dir / "summary.png"
+    fig.savefig(out_png, dpi=120)
+    print(f"Plot saved to: {out_png}")
+    if args.no_show:
+        plt.close(fig)
+    else:
+        plt.show()
 
 
 if __name__ == "__main__":
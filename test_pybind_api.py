@@ -5,7 +5,7 @@ What it does:
   - Loads the BIN file 2025-11-19_13_08_00_MDP_UVTP_exp_time_s_600.bin.
   - Reads singles via read_file_auto.
   - For each same pair (HH, VV, DD, AA) finds best delay, counts coincidences,
-    and optionally collects timetag pairs via coincidences_with_delay_ps.
+    and optionally collects timetag pairs via coincidences_with_delay_np.
   - Reuses the same delays for cross pairs (HV/VH/DA/AD) and reports counts.
   - Writes a summary CSV and plots bar charts for counts and delays.
 """
@@ -45,33 +45,29 @@ def main():
     singles_map, duration = cf.read_file_auto(str(DATA_FILE))
     print(f"Loaded duration: {duration:.2f}s; channels: {list(singles_map.keys())}")
 
-    def flatten(ch):
-        v = singles_map[ch]
-        flat = []
-        for bucket in v.events_per_second:
-            flat.extend(bucket)
-        return np.array(flat, dtype=np.int64)
+    def flatten(v):
+        buckets = [np.asarray(b, dtype=np.int64) for b in v.events_per_second]
+        return np.concatenate(buckets) if buckets else np.empty(0, dtype=np.int64)
+
+    # Every channel flattened once; pairs share the arrays
+    flat = {ch: flatten(v) for ch, v in singles_map.items()}
 
     delay_start_ps = int(DELAY_START_NS * 1000)
     delay_end_ps = int(DELAY_END_NS * 1000)
     delay_step_ps = int(DELAY_STEP_NS * 1000)
 
-    summary = []
-
     delays_ns = {}
+    pairs_ps = []  # (label, c1, c2, delay_ps, delay_ns) counted in one batch
     for lbl, (c1, c2) in SAME.items():
-        ch1 = flatten(c1)
-        ch2 = flatten(c2)
-        best = cf.find_best_delay_ps(ch1.tolist(), ch2.tolist(), COINC_WINDOW_PS,
+        ch1 = flat[c1]
+        ch2 = flat[c2]
+        best = cf.find_best_delay_np(ch1, ch2, COINC_WINDOW_PS,
                                      delay_start_ps, delay_end_ps, delay_step_ps)
         delays_ns[lbl] = best / 1000.0
-        count = cf.count_coincidences_with_delay_ps(ch1.tolist(), ch2.tolist(),
-                                                    COINC_WINDOW_PS, best)
-        summary.append((lbl, delays_ns[lbl], count))
+        pairs_ps.append((lbl, c1, c2, best, delays_ns[lbl]))
 
         # Collect a small sample of hits
-        hits = cf.coincidences_with_delay_ps(ch1.tolist(), ch2.tolist(),
-                                             COINC_WINDOW_PS, best, collect=True)
+        hits = cf.coincidences_with_delay_np(ch1, ch2, COINC_WINDOW_PS, best, collect=True)
         pd.DataFrame(hits, columns=["t1_ps", "t2_ps"]).head(1000).to_csv(
             f"pybind_events_{lbl}.csv", index=False)
 
@@ -79,12 +75,15 @@ def main():
     for lbl, (c1, c2, base) in CROSS.items():
         if base not in delays_ns:
             continue
-        delay_ps = int(delays_ns[base] * 1000)
-        ch1 = flatten(c1)
-        ch2 = flatten(c2)
-        count = cf.count_coincidences_with_delay_ps(ch1.tolist(), ch2.tolist(),
-                                                    COINC_WINDOW_PS, delay_ps)
-        summary.append((lbl, delays_ns[base], count))
+        pairs_ps.append((lbl, c1, c2, int(delays_ns[base] * 1000), delays_ns[base]))
+
+    # All same and cross counts in one call into the extension
+    counts = cf.count_coincidences_pairs_np(
+        {ch: flat[ch] for _, c1, c2, _, _ in pairs_ps for ch in (c1, c2)},
+        [(c1, c2, delay_ps) for _, c1, c2, delay_ps, _ in pairs_ps],
+        COINC_WINDOW_PS)
+    summary = [(lbl, delay_ns, int(count))
+               for (lbl, _, _, _, delay_ns), count in zip(pairs_ps, counts)]
 
     df = pd.DataFrame(summary, columns=["pair", "delay_ns", "coinc"])
     df.to_csv("pybind_coinc_summary.csv", index=False)